@@ -0,0 +1,179 @@
+"""
+Analytics Module
+Server-side aggregation for the analytics dashboard - returns compact series
+instead of shipping every opportunity to the browser
+
+Summaries come from the presales_rollups table (kept current by crud writes)
+whenever the filters only touch status/region, and from presales_tracking otherwise.
+ANALYTICS_SOURCE=live forces the table scan path.
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+from database import get_db
+from crud import build_filter_clause
+
+ANALYTICS_SOURCE = os.getenv("ANALYTICS_SOURCE", "rollup").lower()
+
+# Month bucket used by the dashboard trend chart (same fallback as the UI had)
+MONTH_SQL = "date_trunc('month', coalesce(presales_start_date, expected_planned_start))::date"
+
+# Status the dashboard counts as "active"
+ACTIVE_STATUS = 'Active'
+
+# Filters the rollup table can answer (it is keyed by region x status x month)
+ROLLUP_FILTERS = {'status', 'region'}
+
+def _number(value):
+    """Convert NUMERIC/None aggregates to a JSON-friendly float"""
+    return float(value) if value is not None else 0.0
+
+def _can_use_rollups(filters):
+    if ANALYTICS_SOURCE != 'rollup':
+        return False
+    return not any(value for key, value in (filters or {}).items() if key not in ROLLUP_FILTERS)
+
+def _live_query(filters):
+    conditions, params = build_filter_clause(filters)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT GROUPING(region), GROUPING(status), GROUPING(month),
+               region, status, month,
+               count(*),
+               sum(deal_value_usd),
+               count(*) FILTER (WHERE status = %s),
+               count(*) FILTER (WHERE staffing_completed_flag),
+               now()
+        FROM (
+            SELECT region, status, deal_value_usd, staffing_completed_flag,
+                   {MONTH_SQL} AS month
+            FROM presales_tracking
+            {where}
+        ) filtered
+        GROUP BY GROUPING SETS ((), (region), (status), (month));
+    """
+    return query, [ACTIVE_STATUS] + params
+
+def _rollup_query(filters):
+    conditions, params = build_filter_clause({k: v for k, v in (filters or {}).items() if k in ROLLUP_FILTERS})
+    conditions = ["record_count <> 0"] + conditions
+    # The () grouping set still yields a row when nothing matches - coalesce its NULL sums
+    query = f"""
+        SELECT GROUPING(region), GROUPING(status), GROUPING(month),
+               region, status, month,
+               coalesce(sum(record_count), 0),
+               coalesce(sum(deal_value_sum), 0),
+               coalesce(sum(record_count) FILTER (WHERE status = %s), 0),
+               coalesce(sum(staffed_count), 0),
+               max(refreshed_at)
+        FROM (
+            SELECT NULLIF(region, '') AS region,
+                   NULLIF(status, '') AS status,
+                   NULLIF(month, '-infinity'::date) AS month,
+                   record_count, deal_value_sum, staffed_count, refreshed_at
+            FROM presales_rollups
+        ) rollups
+        WHERE {' AND '.join(conditions)}
+        GROUP BY GROUPING SETS ((), (region), (status), (month));
+    """
+    return query, [ACTIVE_STATUS] + params
+
+def get_summary(filters=None):
+    """
+    Aggregate opportunities matching the filters in a single grouped query
+
+    Returns:
+        dict with totals, monthly, by_region and by_status series, plus
+        source ('rollup' or 'live') and as_of (when the figures were last refreshed)
+    """
+    use_rollups = _can_use_rollups(filters)
+    query, params = _rollup_query(filters) if use_rollups else _live_query(filters)
+
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    totals = {'count': 0, 'total_deal_value': 0.0, 'avg_deal_value': 0.0, 'active_count': 0, 'staffed_count': 0}
+    monthly, by_region, by_status = [], [], []
+    as_of = None
+
+    for g_region, g_status, g_month, region, status, month, count, value, active, staffed, refreshed in rows:
+        count, active, staffed = int(count), int(active), int(staffed)
+        value = _number(value)
+        if g_region and g_status and g_month:
+            as_of = refreshed
+            totals = {
+                'count': count,
+                'total_deal_value': value,
+                'avg_deal_value': value / count if count else 0.0,
+                'active_count': active,
+                'staffed_count': staffed,
+            }
+        elif not g_region:
+            by_region.append({'name': region or 'Unknown', 'count': count, 'value': value})
+        elif not g_status:
+            by_status.append({'name': status or 'Unknown', 'count': count, 'value': value})
+        elif month is not None:
+            monthly.append({'month': month.isoformat(), 'count': count, 'value': value})
+
+    monthly.sort(key=lambda m: m['month'])
+    by_region.sort(key=lambda r: r['value'], reverse=True)
+    by_status.sort(key=lambda s: s['count'], reverse=True)
+
+    return {
+        'totals': totals,
+        'monthly': monthly,
+        'by_region': by_region,
+        'by_status': by_status,
+        'source': 'rollup' if use_rollups else 'live',
+        'as_of': as_of or datetime.now(timezone.utc),
+    }
+
+def rebuild_rollups_with_cursor(cursor):
+    """
+    Recompute presales_rollups inside the caller's transaction
+    Blocks opportunity writes until that transaction ends so no delta is lost
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    cursor.execute("LOCK TABLE presales_tracking IN SHARE MODE")
+    cursor.execute("DELETE FROM presales_rollups")
+    cursor.execute(f"""
+        INSERT INTO presales_rollups (region, status, month, record_count, deal_value_sum, staffed_count, refreshed_at)
+        SELECT coalesce(region, ''),
+               coalesce(status, ''),
+               coalesce({MONTH_SQL}, '-infinity'::date),
+               count(*),
+               coalesce(sum(deal_value_usd), 0),
+               count(*) FILTER (WHERE staffing_completed_flag),
+               now()
+        FROM presales_tracking
+        GROUP BY 1, 2, 3;
+    """)
+    return cursor.rowcount
+
+def rebuild_rollups():
+    """Recompute presales_rollups from scratch"""
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        rebuilt = rebuild_rollups_with_cursor(cursor)
+        conn.commit()
+        return rebuilt
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python analytics.py rebuild")
+        sys.exit(1)
+    print(f" Rebuilt {rebuild_rollups()} rollup rows")
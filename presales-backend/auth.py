@@ -4,10 +4,48 @@ Handles Google SSO authentication, role-based access control, and invite approva
 Uses database for invite token storage instead of in-memory
 """
 
+import os
 from datetime import datetime, timedelta
 from database import get_db
+from cache import TTLCache
 import email_service as email_service
 import secrets
+import hashlib
+import metrics
+
+# Authenticated-user cache - a role change or removal takes effect on other
+# instances within USER_CACHE_TTL_SECONDS; this instance invalidates immediately
+USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", "true").lower() == "true"
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+
+user_cache = TTLCache(
+    max_size=USER_CACHE_MAX_SIZE,
+    ttl=USER_CACHE_TTL_SECONDS,
+    enabled=USER_CACHE_ENABLED,
+)
+
+# token_version lookups for claims-based JWTs, keyed by user id
+TOKEN_VERSION_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_VERSION_CACHE_TTL_SECONDS", "30"))
+
+token_version_cache = TTLCache(
+    max_size=USER_CACHE_MAX_SIZE,
+    ttl=TOKEN_VERSION_CACHE_TTL_SECONDS,
+    enabled=USER_CACHE_ENABLED,
+)
+
+# Stream tickets stand in for the JWT on /opportunities/stream and are redeemable once
+STREAM_TICKET_TTL_SECONDS = int(os.getenv("STREAM_TICKET_TTL_SECONDS", "30"))
+
+# Cached for users that no longer exist (or are not approved) so stale tokens stay cheap to reject
+REVOKED_TOKEN_VERSION = -1
+
+def invalidate_user_cache(email: str, user_id: str = None):
+    """Drop a user from the authenticated-user and token-version caches"""
+    if email:
+        user_cache.invalidate(email)
+    if user_id:
+        token_version_cache.invalidate(str(user_id))
 
 def generate_invite_token():
     """Generate a secure random token for invites"""
@@ -16,7 +54,6 @@ def generate_invite_token():
 def get_user_by_email(email: str):
     """Get user by email"""
     conn = get_db()
-    cursor = conn.cursor()
     
     try:
         query = """
@@ -25,8 +62,7 @@ def get_user_by_email(email: str):
             WHERE email = %s;
         """
         
-        cursor.execute(query, (email,))
-        result = cursor.fetchone()
+        result = conn.execute_prepared(query, (email,)).fetchone()
         
         if not result:
             return None
@@ -43,49 +79,158 @@ def get_user_by_email(email: str):
     finally:
         conn.close()
 
-def create_or_update_user(email: str, name: str):
+def get_cached_user_by_email(email: str):
+    """Get user by email through the authenticated-user cache (unknown users are not cached)"""
+    user = user_cache.get(email)
+    if user is None:
+        user = get_user_by_email(email)
+        if user is not None:
+            user_cache.set(email, user)
+    return dict(user) if user is not None else None
+
+def get_token_version(user_id: str):
+    """Current token_version for an approved user, or REVOKED_TOKEN_VERSION"""
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(
+            "SELECT token_version FROM users WHERE id = %s AND invite_status = 'approved';",
+            (user_id,)
+        )
+        result = cursor.fetchone()
+        return result[0] if result else REVOKED_TOKEN_VERSION
+    finally:
+        conn.close()
+
+def peek_token_version(user_id: str):
+    """Cached token_version for a user, or None when it has to be loaded"""
+    return token_version_cache.get(str(user_id))
+
+def get_cached_token_version(user_id: str):
+    """Get token_version through the cache"""
+    version = peek_token_version(user_id)
+    if version is None:
+        version = get_token_version(user_id)
+        token_version_cache.set(str(user_id), version)
+    return version
+
+def _stream_ticket_hash(ticket: str):
+    return hashlib.sha256(ticket.encode("utf-8")).hexdigest()
+
+def issue_stream_ticket(email: str):
     """
-    Create or update user from Google SSO
-    Only allows @google.com emails that are pre-approved by admin
+    Create a single-use ticket for opening the change stream as email
+
+    Returns:
+        str: The opaque ticket, valid for STREAM_TICKET_TTL_SECONDS
     """
+    ticket = secrets.token_urlsafe(32)
     conn = get_db()
     cursor = conn.cursor()
     
     try:
-        # Check if user exists
-        existing_user = get_user_by_email(email)
-        
-        if existing_user:
-            # Check if invite was approved
-            if existing_user.get('invite_status') == 'pending':
-                raise ValueError("Your invitation is pending. Please check your email and approve the invitation first.")
-            elif existing_user.get('invite_status') == 'rejected':
-                raise ValueError("Your invitation was declined. Please contact the administrator for a new invitation.")
-            
-            # Update user name
-            query = """
-                UPDATE users 
-                SET name = %s
-                WHERE email = %s
-                RETURNING id, email, name, role, created_at;
+        # Expired tickets are never redeemed - clear them out while we are here
+        cursor.execute("DELETE FROM stream_tickets WHERE expires_at < now();")
+        cursor.execute(
             """
-            cursor.execute(query, (name, email))
-        else:
-            raise ValueError("Access denied. Please contact admin to request access.")
-            
+            INSERT INTO stream_tickets (ticket_hash, email, expires_at)
+            VALUES (%s, %s, now() + make_interval(secs => %s));
+            """,
+            (_stream_ticket_hash(ticket), email, STREAM_TICKET_TTL_SECONDS)
+        )
+        conn.commit()
+        return ticket
+        
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def redeem_stream_ticket(ticket: str):
+    """
+    Consume a stream ticket
+
+    Returns:
+        str: The email it was issued to, or None if it is unknown, expired or already used
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    try:
+        # Deleting the row is what makes the ticket single-use, even across instances
+        cursor.execute(
+            """
+            DELETE FROM stream_tickets
+            WHERE ticket_hash = %s
+            RETURNING email, expires_at > now();
+            """,
+            (_stream_ticket_hash(ticket),)
+        )
         result = cursor.fetchone()
         conn.commit()
+        if not result or not result[1]:
+            return None
+        return result[0]
+        
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+# Login in one statement: the row's status decides the outcome and the name is
+# only rewritten when Google reports a different one
+LOGIN_QUERY = """
+    WITH target AS (
+        SELECT id, email, name, role, created_at, token_version, invite_status
+        FROM users
+        WHERE email = %s
+    ), renamed AS (
+        UPDATE users u
+        SET name = %s
+        FROM target t
+        WHERE u.id = t.id AND t.invite_status = 'approved' AND u.name IS DISTINCT FROM %s
+        RETURNING u.id, u.name, u.token_version
+    )
+    SELECT t.id, t.email, coalesce(r.name, t.name), t.role, t.created_at,
+           coalesce(r.token_version, t.token_version), t.invite_status, r.id IS NOT NULL
+    FROM target t
+    LEFT JOIN renamed r ON r.id = t.id;
+"""
+
+def create_or_update_user(email: str, name: str):
+    """
+    Create or update user from Google SSO
+    Only allows @google.com emails that are pre-approved by admin
+    """
+    conn = get_db()
+    
+    try:
+        # A single statement commits on its own - no BEGIN / COMMIT round trips
+        result = conn.execute_prepared(LOGIN_QUERY, (email, name, name), autocommit=True).fetchone()
+        
+        if not result:
+            raise ValueError("Access denied. Please contact admin to request access.")
+        
+        # Check if invite was approved
+        if result[6] == 'pending':
+            raise ValueError("Your invitation is pending. Please check your email and approve the invitation first.")
+        elif result[6] == 'rejected':
+            raise ValueError("Your invitation was declined. Please contact the administrator for a new invitation.")
+        
+        if result[7]:
+            invalidate_user_cache(email)
         return {
             'id': str(result[0]),
             'email': result[1],
             'name': result[2],
             'role': result[3],
-            'created_at': result[4]
+            'created_at': result[4],
+            'token_version': result[5]
         }
         
-    except Exception as e:
-        conn.rollback()
-        raise e
     finally:
         conn.close()
 
@@ -155,6 +300,9 @@ def add_user(email: str, name: str, role: str, admin_name: str):
         """
         
         cursor.execute(token_query, (invite_token, email, 'pending', datetime.now(), token_expiry))
+        
+        # Send invitation email - queued in this transaction, so the user and the email commit together
+        email_service.send_invite_email(email, name, role, admin_name, invite_token, cursor=cursor)
         conn.commit()
         
         user_data = {
@@ -165,9 +313,6 @@ def add_user(email: str, name: str, role: str, admin_name: str):
             'created_at': result[4]
         }
         
-        # Send invitation email
-        email_service.send_invite_email(email, name, role, admin_name, invite_token)
-        
         return user_data
         
     except Exception as e:
@@ -229,10 +374,11 @@ def approve_invite(token: str, admin_email: str):
         """
         
         cursor.execute(update_token_query, (token,))
-        conn.commit()
         
-        # Notify admin
-        email_service.send_approval_notification_to_admin(user_email, user_name, admin_email)
+        # Notify admin - queued in this transaction
+        email_service.send_approval_notification_to_admin(user_email, user_name, admin_email, cursor=cursor)
+        conn.commit()
+        invalidate_user_cache(user_email, result[0])
         
         return {
             'id': str(result[0]),
@@ -301,10 +447,11 @@ def reject_invite(token: str, admin_email: str):
         """
         
         cursor.execute(update_token_query, (token,))
-        conn.commit()
         
-        # Notify admin
-        email_service.send_rejection_notification_to_admin(user_email, user_name, admin_email)
+        # Notify admin - queued in this transaction
+        email_service.send_rejection_notification_to_admin(user_email, user_name, admin_email, cursor=cursor)
+        conn.commit()
+        invalidate_user_cache(user_email, result[0])
         
         return {
             'id': str(result[0]),
@@ -340,16 +487,21 @@ def update_user_role(user_id: str, role: str, admin_name: str):
         if role not in valid_roles:
             raise ValueError(f"Invalid role. Must be one of: {', '.join(valid_roles)}")
         
+        # Bumping token_version revokes claims-based tokens carrying the old role
         query = """
             UPDATE users 
-            SET role = %s
+            SET role = %s, token_version = token_version + 1
             WHERE id = %s
             RETURNING id, email, name, role, created_at;
         """
         
         cursor.execute(query, (role, user_id))
         result = cursor.fetchone()
+        
+        # Send role change notification - queued in this transaction
+        email_service.send_role_changed_email(old_email, old_name, old_role, role, admin_name, cursor=cursor)
         conn.commit()
+        invalidate_user_cache(old_email, user_id)
         
         user_data = {
             'id': str(result[0]),
@@ -359,9 +511,6 @@ def update_user_role(user_id: str, role: str, admin_name: str):
             'created_at': result[4]
         }
         
-        # Send role change notification
-        email_service.send_role_changed_email(old_email, old_name, old_role, role, admin_name)
-        
         return user_data
         
     except Exception as e:
@@ -397,10 +546,11 @@ def delete_user(user_id: str, admin_name: str):
         
         cursor.execute(query, (user_id,))
         result = cursor.fetchone()
-        conn.commit()
         
-        # Send removal notification
-        email_service.send_user_removed_email(user_email, user_name, admin_name)
+        # Send removal notification - queued in this transaction
+        email_service.send_user_removed_email(user_email, user_name, admin_name, cursor=cursor)
+        conn.commit()
+        invalidate_user_cache(user_email, user_id)
         
         return {
             'id': str(result[0]),
@@ -411,4 +561,16 @@ def delete_user(user_id: str, admin_name: str):
         conn.rollback()
         raise e
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+def _collect_metrics():
+    caches = (("user", user_cache.stats()), ("token_version", token_version_cache.stats()))
+    return [
+        ("auth_cache_lookups_total", "counter", "Authenticated-user and token-version cache lookups",
+         [({"cache": name, "outcome": outcome}, stats[key])
+          for name, stats in caches for outcome, key in (("hit", "hits"), ("miss", "misses"))]),
+        ("auth_cache_entries", "gauge", "Entries held by the authenticated-user and token-version caches",
+         [({"cache": name}, stats["size"]) for name, stats in caches]),
+    ]
+
+metrics.add_collector(_collect_metrics)
@@ -0,0 +1,82 @@
+"""
+In-process caching helpers
+Small thread-safe TTL + LRU cache used for hot lookups on the request path
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Thread-safe mapping with per-entry expiry and least-recently-used eviction
+
+    Args:
+        max_size: Maximum number of entries kept; the least recently used is evicted first
+        ttl: Seconds an entry stays valid after it is stored
+        enabled: When False every lookup is a miss and nothing is stored
+    """
+
+    def __init__(self, max_size=1024, ttl=30.0, enabled=True):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled and max_size > 0 and ttl > 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value or default if missing/expired"""
+        now = time.monotonic()
+        with self._lock:
+            if not self.enabled:
+                self.misses += 1
+                return default
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING or item[1] <= now:
+                if item is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entry when full; ttl overrides the default"""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
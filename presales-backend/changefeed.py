@@ -0,0 +1,216 @@
+"""
+Change Feed Module
+Pushes row-level opportunity changes to Server-Sent Events subscribers.
+
+- crud writes append to presales_change_log and NOTIFY presales_changes on commit
+- One listener thread per process holds a dedicated LISTEN connection, reads
+  the new log entries once and fans them out to every open stream, so the
+  cost of a write does not grow with the number of connected tabs
+- The listener polls: pg8000 only picks up notifications while it talks to
+  the server, so it sends a "SELECT 1" every CHANGEFEED_POLL_INTERVAL. Changes
+  reach the streams up to that long after the commit, and each process costs
+  the database one trivial query per interval while the feed is running
+- Event ids are "<version>-<record_id>"; a reconnecting client sends the last
+  one as Last-Event-ID and the stream replays what it missed from the log.
+  When that part of the log has been pruned a 'reset' event is sent instead
+  and the client should reload all records.
+"""
+
+import os
+import json
+import asyncio
+import logging
+import threading
+from fastapi.encoders import jsonable_encoder
+from database import open_connection
+from workers import run_db
+import crud
+
+logger = logging.getLogger(__name__)
+
+CHANGEFEED_ENABLED = os.getenv("CHANGEFEED_ENABLED", "true").lower() == "true"
+CHANGEFEED_POLL_INTERVAL = float(os.getenv("CHANGEFEED_POLL_INTERVAL", "1"))  # Seconds between notification polls
+CHANGEFEED_HEARTBEAT = float(os.getenv("CHANGEFEED_HEARTBEAT", "15"))  # Keep-alive comment on idle streams
+CHANGEFEED_QUEUE_SIZE = int(os.getenv("CHANGEFEED_QUEUE_SIZE", "1000"))  # Events buffered per stream before it is dropped
+CHANGEFEED_RETRY_MS = 3000
+
+# Record id that sorts after every real id - a bare version means "after all of it"
+MAX_RECORD_ID = 2 ** 63 - 1
+
+def parse_event_id(value):
+    """
+    Stream position from a Last-Event-ID / since value
+    '<version>-<record_id>' resumes after that event, a bare '<version>' after the whole version
+    """
+    if not value:
+        return None
+    try:
+        version, _, record_id = value.strip().partition('-')
+        return int(version), int(record_id) if record_id else MAX_RECORD_ID
+    except ValueError:
+        raise ValueError("Invalid event id - expected '<version>' or '<version>-<record_id>'")
+
+def format_event(change):
+    data = json.dumps(jsonable_encoder(change), separators=(',', ':'))
+    return f"id: {change['version']}-{change['id']}\nevent: change\ndata: {data}\n\n"
+
+class _Subscriber:
+    __slots__ = ("loop", "queue", "overflowed")
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(CHANGEFEED_QUEUE_SIZE)
+        self.overflowed = False
+
+class ChangeHub:
+    """Process-wide LISTEN connection fanning logged changes out to asyncio subscribers"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()  # Guards _subscribers only - taken on the event loop
+        self._start_lock = threading.Lock()  # Serializes start/stop, held while connecting
+        self._stopping = threading.Event()
+        self._thread = None
+        self.position = None
+
+    def start(self):
+        """
+        Start listening (idempotent, blocking - call through run_db)
+        Returns once LISTEN is active, so every commit after this call is published
+        """
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            conn = self._listen()
+            if self.position is None:
+                self.position = crud.get_change_position()
+            self._thread = threading.Thread(target=self._run, args=(conn,), name="changefeed", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._start_lock:
+            self._stopping.set()
+            if self._thread is not None:
+                self._thread.join(timeout)
+                self._thread = None
+
+    def subscribe(self):
+        """Register a stream on the running event loop"""
+        subscriber = _Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _listen(self):
+        conn = open_connection()
+        # Notifications are only delivered outside a transaction
+        conn.autocommit = True
+        conn.cursor().execute(f"LISTEN {crud.CHANGE_CHANNEL}")
+        return conn
+
+    @staticmethod
+    def _deliver(subscriber, changes):
+        """Runs on the subscriber's event loop"""
+        for change in changes:
+            try:
+                subscriber.queue.put_nowait(change)
+            except asyncio.QueueFull:
+                # The stream is closed and the client resumes from the log on reconnect
+                subscriber.overflowed = True
+                return
+
+    def _publish(self, changes):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(self._deliver, subscriber, changes)
+            except RuntimeError:
+                self.unsubscribe(subscriber)  # Event loop already closed
+
+    def _catch_up(self):
+        """Publish every logged change after the current position"""
+        while True:
+            changes = crud.get_changes_after(*self.position)
+            if not changes:
+                return
+            self._publish(changes)
+            self.position = (changes[-1]['version'], changes[-1]['id'])
+            if len(changes) < crud.CHANGE_BATCH_SIZE:
+                return
+
+    def _run(self, conn):
+        while not self._stopping.is_set():
+            try:
+                if conn is None:
+                    conn = self._listen()
+                self._catch_up()
+                cursor = conn.cursor()
+                while not self._stopping.is_set():
+                    # Poll - pg8000 reads pending notifications whenever it talks to the server
+                    cursor.execute("SELECT 1")
+                    if conn.notifications:
+                        conn.notifications.clear()
+                        self._catch_up()
+                    self._stopping.wait(CHANGEFEED_POLL_INTERVAL)
+            except Exception as e:
+                logger.error(f"Change feed listener error: {e}")
+                self._stopping.wait(5)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                    conn = None
+
+hub = ChangeHub()
+
+async def event_stream(request, position=None):
+    """
+    SSE body for one client
+    Replays the log after position (or starts at the current head), then follows live changes
+    """
+    subscriber = hub.subscribe()
+    try:
+        if position is None:
+            position = await run_db(crud.get_change_position)
+            # Sets the client's Last-Event-ID so a reconnect before the first change loses nothing
+            yield f"retry: {CHANGEFEED_RETRY_MS}\nid: {position[0]}-{position[1]}\nevent: ready\ndata: {{}}\n\n"
+        elif position[0] < (await run_db(crud.get_data_version))['log_floor']:
+            # The log no longer reaches back that far - the client has to reload everything
+            position = await run_db(crud.get_change_position)
+            yield f"retry: {CHANGEFEED_RETRY_MS}\nid: {position[0]}-{position[1]}\nevent: reset\ndata: {{}}\n\n"
+        else:
+            yield f"retry: {CHANGEFEED_RETRY_MS}\nevent: ready\ndata: {{}}\n\n"
+            while True:
+                changes = await run_db(crud.get_changes_after, *position)
+                for change in changes:
+                    yield format_event(change)
+                if changes:
+                    position = (changes[-1]['version'], changes[-1]['id'])
+                if len(changes) < crud.CHANGE_BATCH_SIZE:
+                    break
+
+        while not await request.is_disconnected():
+            try:
+                change = await asyncio.wait_for(subscriber.queue.get(), CHANGEFEED_HEARTBEAT)
+            except asyncio.TimeoutError:
+                if subscriber.overflowed:
+                    break
+                yield ": keepalive\n\n"
+                continue
+            key = (change['version'], change['id'])
+            if key <= position:
+                continue  # Already sent during the replay
+            yield format_event(change)
+            position = key
+            if subscriber.overflowed and subscriber.queue.empty():
+                break
+    finally:
+        hub.unsubscribe(subscriber)
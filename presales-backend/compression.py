@@ -0,0 +1,155 @@
+"""
+Response Compression Middleware
+gzip / brotli content encoding negotiated from Accept-Encoding.
+
+- Bodies below COMPRESSION_MIN_SIZE and already-compressed media types
+  (xlsx, Arrow, images) are sent as is
+- Streaming responses are compressed chunk by chunk and flushed after every
+  chunk, so exports still start immediately and Server-Sent Events are never
+  held back in the compressor (text/event-stream is excluded anyway)
+- brotli is used when the brotli package is installed and the client prefers it
+"""
+
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # Bytes; smaller bodies are not worth the CPU
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+# Media types that are already compressed or must reach the client unbuffered
+EXCLUDED_MEDIA_TYPES = (
+    'text/event-stream',
+    'application/vnd.openxmlformats-officedocument',
+    'application/vnd.apache.arrow',
+    'application/zip',
+    'application/gzip',
+    'image/',
+    'video/',
+    'audio/',
+)
+
+def choose_encoding(accept_encoding):
+    """Best supported coding from an Accept-Encoding header ('br', 'gzip' or None)"""
+    offered = {}
+    for item in (accept_encoding or '').split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        offered[coding.lower()] = quality
+
+    wildcard = offered.get('*', 0.0)
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best, best_quality = None, 0.0
+    for coding in candidates:
+        quality = offered.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+class _Compressor:
+    def __init__(self, coding):
+        self.coding = coding
+        if coding == 'br':
+            self._impl = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._impl = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data):
+        """Compress data and flush it so the client can decode everything sent so far"""
+        if self.coding == 'br':
+            return self._impl.process(data) + self._impl.flush()
+        return self._impl.compress(data) + self._impl.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b''):
+        if self.coding == 'br':
+            return self._impl.process(data) + self._impl.finish()
+        return self._impl.compress(data) + self._impl.flush(zlib.Z_FINISH)
+
+class CompressionMiddleware:
+    """ASGI middleware applying gzip / brotli to eligible HTTP responses"""
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        coding = choose_encoding(headers.get(b'accept-encoding', b'').decode('latin-1'))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message['type'] == 'http.response.start':
+                start_message = message
+                response_headers = dict(message.get('headers') or [])
+                media_type = response_headers.get(b'content-type', b'').decode('latin-1')
+                passthrough = (
+                    b'content-encoding' in response_headers
+                    or message['status'] in (204, 304)
+                    or media_type.startswith(EXCLUDED_MEDIA_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                return
+
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    # Small complete body - send it untouched
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(coding)
+                response_headers = [
+                    (name, value) for name, value in start_message.get('headers', [])
+                    if name.lower() != b'content-length'
+                ]
+                response_headers.append((b'content-encoding', coding.encode('latin-1')))
+                vary = [value for name, value in response_headers if name.lower() == b'vary']
+                if not any(b'accept-encoding' in value.lower() for value in vary):
+                    response_headers.append((b'vary', b'Accept-Encoding'))
+                if not more_body:
+                    body = compressor.finish(body)
+                    response_headers.append((b'content-length', str(len(body)).encode('latin-1')))
+                    await send({**start_message, 'headers': response_headers})
+                    await send({'type': 'http.response.body', 'body': body, 'more_body': False})
+                    return
+                await send({**start_message, 'headers': response_headers})
+
+            data = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,61 @@
+"""
+Conditional request helpers
+ETag / Last-Modified validators for opportunity reads, so polling clients get
+304 Not Modified instead of the full payload, and If-Match checks for writes
+"""
+
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+def _micros(timestamp):
+    return int(timestamp.timestamp() * 1_000_000)
+
+def record_etag(record):
+    """ETag of a single opportunity - changes whenever its updated_at does"""
+    return f'W/"r{record["id"]}-{_micros(record["updated_at"])}"'
+
+def collection_etag(version, request_key):
+    """ETag of a list response - the data version plus a digest of the query that shaped it"""
+    digest = hashlib.sha1(request_key.encode()).hexdigest()[:16]
+    return f'W/"v{version}-{digest}"'
+
+def http_date(timestamp):
+    return format_datetime(timestamp.astimezone(timezone.utc), usegmt=True)
+
+def etag_matches(header, etag):
+    """
+    Weak comparison of an If-None-Match / If-Match header against an ETag
+    '*' matches any current representation
+    """
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in header.split(',') if tag.strip()]
+    return '*' in tags or etag.removeprefix('W/') in tags
+
+def not_modified(headers, etag, last_modified=None):
+    """
+    True when the client's cached copy is still current
+    If-None-Match wins over If-Modified-Since when both are sent (RFC 9110)
+    """
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have whole-second precision
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def validator_headers(etag, last_modified=None):
+    """ETag / Last-Modified plus Cache-Control asking browsers to revalidate every time"""
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
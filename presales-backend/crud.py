@@ -1,3 +1,9 @@
+import base64
+import json
+import os
+import sys
+from datetime import date, datetime
+from decimal import Decimal
 from database import get_db
 
 ALLOWED_COLUMNS = {
@@ -8,6 +14,45 @@ ALLOWED_COLUMNS = {
     'sow_signature_date', 'staffing_completed_flag', 'staffing_poc', 'remarks'
 }
 
+# Columns the list endpoint can sort and keyset-paginate on, with the Python type
+# needed to turn a cursor value back into a query parameter
+SORTABLE_COLUMNS = {
+    'id': int,
+    'account_name': str,
+    'opportunity': str,
+    'region': str,
+    'sub_region': str,
+    'status': str,
+    'deal_value_usd': Decimal,
+    'period_of_presales_weeks': int,
+    'presales_start_date': date,
+    'expected_planned_start': date,
+    'sow_signature_date': date,
+}
+
+# Free-text search document over the descriptive and people columns.
+# Must match the expression indexes in migrations/0002_opportunity_search.sql exactly,
+# otherwise Postgres cannot use them.
+SEARCH_TEXT_SQL = (
+    "(coalesce(account_name, '') || ' ' || coalesce(opportunity, '') || ' ' || "
+    "coalesce(remarks, '') || ' ' || coalesce(assignee_from_gsd, '') || ' ' || "
+    "coalesce(pursuit_lead, '') || ' ' || coalesce(delivery_manager, '') || ' ' || "
+    "coalesce(staffing_poc, ''))"
+)
+
+# Range filter name -> SQL condition on its column
+RANGE_FILTERS = {
+    'presales_start_from': "presales_start_date >= %s",
+    'presales_start_to': "presales_start_date <= %s",
+    'sow_signature_from': "sow_signature_date >= %s",
+    'sow_signature_to': "sow_signature_date <= %s",
+    'min_deal_value': "deal_value_usd >= %s",
+    'max_deal_value': "deal_value_usd <= %s",
+}
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
 def _dict_from_row(cursor, row):
     """Convert pg8000 row to dictionary"""
     if row is None:
@@ -15,6 +60,297 @@ def _dict_from_row(cursor, row):
     columns = [desc[0] for desc in cursor.description]
     return dict(zip(columns, row))
 
+def _columns(cursor):
+    """Column names of the last result set - take them once per query, not per row"""
+    return tuple(desc[0] for desc in cursor.description)
+
+def _column_types(cursor):
+    """Postgres type OIDs of the last result set, in column order"""
+    return tuple(desc[1] for desc in cursor.description)
+
+def _dicts_from_rows(cursor, rows):
+    """Convert a list of pg8000 rows to dictionaries sharing one column layout"""
+    columns = _columns(cursor)
+    return [dict(zip(columns, row)) for row in rows]
+
+# Column order of the INSERT statements, matching create_record's query
+INSERT_COLUMNS = (
+    'account_name', 'opportunity', 'region_location', 'region', 'sub_region',
+    'deal_value_usd', 'scoping_doc', 'vector_link', 'charging_on_vector',
+    'period_of_presales_weeks', 'status', 'assignee_from_gsd', 'pursuit_lead',
+    'delivery_manager', 'presales_start_date', 'expected_planned_start',
+    'sow_signature_date', 'staffing_completed_flag', 'staffing_poc', 'remarks'
+)
+
+# Postgres types used to cast bulk UPDATE ... FROM (VALUES ...) parameters,
+# which cannot infer their type from a target column
+COLUMN_TYPES = {
+    'deal_value_usd': 'numeric',
+    'period_of_presales_weeks': 'integer',
+    'presales_start_date': 'date',
+    'expected_planned_start': 'date',
+    'sow_signature_date': 'date',
+    'staffing_completed_flag': 'boolean',
+}
+
+def _insert_values(data):
+    """INSERT parameters in INSERT_COLUMNS order - missing fields become NULL"""
+    # Use .get() with None as default - this properly handles null values from frontend
+    return tuple(
+        data.get(column, False) if column == 'staffing_completed_flag' else data.get(column)
+        for column in INSERT_COLUMNS
+    )
+
+# ANALYTICS ROLLUPS
+def _rollup_bucket(row):
+    """(region, status, month) rollup key for a record, using '' / -infinity for NULLs"""
+    bucket_date = row.get('presales_start_date') or row.get('expected_planned_start')
+    month = date(bucket_date.year, bucket_date.month, 1) if bucket_date else None
+    return row.get('region') or '', row.get('status') or '', month
+
+def _apply_rollup_delta(cursor, row, sign):
+    """
+    Add (sign=1) or remove (sign=-1) one record from presales_rollups
+    Runs inside the caller's transaction so the rollups never drift from the table
+    """
+    if row is None:
+        return
+    region, status, month = _rollup_bucket(row)
+    deal_value = row.get('deal_value_usd') or 0
+    staffed = 1 if row.get('staffing_completed_flag') else 0
+    cursor.execute(
+        """
+        INSERT INTO presales_rollups (region, status, month, record_count, deal_value_sum, staffed_count, refreshed_at)
+        VALUES (%s, %s, coalesce(%s::date, '-infinity'::date), %s, %s, %s, now())
+        ON CONFLICT (region, status, month) DO UPDATE SET
+            record_count = presales_rollups.record_count + EXCLUDED.record_count,
+            deal_value_sum = presales_rollups.deal_value_sum + EXCLUDED.deal_value_sum,
+            staffed_count = presales_rollups.staffed_count + EXCLUDED.staffed_count,
+            refreshed_at = EXCLUDED.refreshed_at;
+        """,
+        (region, status, month, sign, sign * deal_value, sign * staffed),
+    )
+
+# DATA VERSION / CHANGE LOG
+# NOTIFY channel carrying newly committed data versions (see changefeed.py)
+CHANGE_CHANNEL = 'presales_changes'
+CHANGE_BATCH_SIZE = 500
+MAX_CHANGES_PAGE = 5000
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30"))
+
+class PreconditionFailed(Exception):
+    """The record changed since the client read it (If-Match mismatch)"""
+
+class ChangesExpired(Exception):
+    """The change log no longer covers the requested version - the client must resync in full"""
+
+def bump_data_version(cursor):
+    """
+    Advance the table-level data version inside the caller's write transaction
+    Readers use it to answer conditional GETs without touching presales_tracking.
+    The row lock taken here is held until commit, so versions commit in order.
+    """
+    cursor.execute(
+        "UPDATE presales_data_version SET version = version + 1, updated_at = now() "
+        "WHERE id = 1 RETURNING version, updated_at"
+    )
+    return cursor.fetchone()
+
+def record_changes(cursor, changes):
+    """
+    Bump the data version and log row-level changes inside the caller's write transaction
+    Listeners are notified on commit, so they only ever see committed versions
+    
+    Args:
+        changes: iterable of (record_id, op) with op 'insert', 'update' or 'delete'
+    
+    Returns:
+        int: The new data version
+    """
+    # One entry per record and version - the last operation wins
+    ops = {}
+    for record_id, op in changes:
+        ops[record_id] = op
+    version, _ = bump_data_version(cursor)
+    if ops:
+        cursor.execute(
+            "INSERT INTO presales_change_log (version, record_id, op) "
+            "SELECT %s, * FROM unnest(%s::bigint[], %s::text[])",
+            (version, list(ops), list(ops.values())),
+        )
+        cursor.execute("SELECT pg_notify(%s, %s)", (CHANGE_CHANNEL, str(version)))
+    return version
+
+def get_change_position():
+    """(version, record_id) of the newest change log entry, (0, 0) when empty"""
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT version, record_id FROM presales_change_log "
+            "ORDER BY version DESC, record_id DESC LIMIT 1"
+        )
+        result = cursor.fetchone()
+        return (int(result[0]), int(result[1])) if result else (0, 0)
+    finally:
+        conn.close()
+
+def get_changes_after(version, record_id=0, limit=CHANGE_BATCH_SIZE):
+    """
+    Logged changes after position (version, record_id), oldest first
+    
+    Returns:
+        list of dicts with version, id, op and data - the record as it is now,
+        or None for deletes and records deleted since
+    """
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT l.version, l.record_id, l.op, t.*
+            FROM presales_change_log l
+            LEFT JOIN presales_tracking t ON t.id = l.record_id
+            WHERE (l.version, l.record_id) > (%s, %s)
+            ORDER BY l.version, l.record_id
+            LIMIT %s
+            """,
+            (version, record_id, limit),
+        )
+        rows = cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description][3:]
+    finally:
+        conn.close()
+    return [
+        {
+            'version': row[0],
+            'id': row[1],
+            'op': row[2],
+            'data': dict(zip(columns, row[3:])) if row[2] != 'delete' and row[3] is not None else None,
+        }
+        for row in rows
+    ]
+
+def _parse_changes_cursor(cursor_token):
+    try:
+        until, _, after_id = cursor_token.partition('-')
+        return int(until), int(after_id)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+def get_changes_since(since_version, cursor_token=None, limit=CHANGE_BATCH_SIZE):
+    """
+    Records inserted or updated after since_version, plus tombstones for deleted ids
+    Each record appears once with its current state, however often it changed.
+    
+    Args:
+        since_version: 'version' from the client's previous sync
+        cursor_token: next_cursor from the previous page of this sync
+        limit: Maximum number of records (changed + deleted) per page
+    
+    Returns:
+        dict with data (changed records), deleted (ids), version (store it as the next
+        since once next_cursor is None) and next_cursor
+    
+    Raises:
+        ChangesExpired when since_version is older than the retained change log
+    """
+    limit = max(1, min(int(limit or CHANGE_BATCH_SIZE), MAX_CHANGES_PAGE))
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version, log_floor FROM presales_data_version WHERE id = 1")
+        current, log_floor = cursor.fetchone()
+        if since_version < log_floor or since_version > current:
+            raise ChangesExpired(
+                f"Changes since version {since_version} are not available "
+                f"(retained: {log_floor} to {current}) - reload all records"
+            )
+        # Every page of one sync reads up to the version the first page saw
+        until, after_id = _parse_changes_cursor(cursor_token) if cursor_token else (current, 0)
+        cursor.execute(
+            """
+            SELECT c.record_id, t.*
+            FROM (
+                SELECT DISTINCT record_id
+                FROM presales_change_log
+                WHERE version > %s AND version <= %s AND record_id > %s
+            ) c
+            LEFT JOIN presales_tracking t ON t.id = c.record_id
+            ORDER BY c.record_id
+            LIMIT %s
+            """,
+            (since_version, until, after_id, limit + 1),
+        )
+        rows = cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description][1:]
+    finally:
+        conn.close()
+
+    page = rows[:limit]
+    changed, deleted = [], []
+    for row in page:
+        if row[1] is None:
+            deleted.append(row[0])
+        else:
+            changed.append(dict(zip(columns, row[1:])))
+    return {
+        'data': changed,
+        'deleted': deleted,
+        'version': until,
+        'next_cursor': f"{until}-{page[-1][0]}" if len(rows) > limit else None,
+    }
+
+def prune_change_log(retention_days=CHANGE_LOG_RETENTION_DAYS):
+    """
+    Drop change log entries older than the retention window and raise log_floor
+    Clients syncing from before the new floor get ChangesExpired and reload
+    
+    Returns:
+        int: Number of entries removed
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            WITH pruned AS (
+                DELETE FROM presales_change_log
+                WHERE version <= (
+                    SELECT max(version) FROM presales_change_log
+                    WHERE changed_at < now() - make_interval(days => %s)
+                )
+                RETURNING version
+            )
+            UPDATE presales_data_version
+            SET log_floor = greatest(log_floor, (SELECT max(version) FROM pruned))
+            WHERE id = 1 AND EXISTS (SELECT 1 FROM pruned)
+            RETURNING (SELECT count(*) FROM pruned)
+            """,
+            (retention_days,),
+        )
+        result = cursor.fetchone()
+        conn.commit()
+        return int(result[0]) if result else 0
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def get_data_version():
+    """
+    Current data version - returns dict with version, updated_at and log_floor
+    (the oldest version the change log can still answer "changes since" for)
+    """
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version, updated_at, log_floor FROM presales_data_version WHERE id = 1")
+        return _dict_from_row(cursor, cursor.fetchone())
+    finally:
+        conn.close()
+
 # CREATE
 def create_record(data):
     """Insert new record - accepts None/null values for optional fields"""
@@ -35,35 +371,15 @@ def create_record(data):
             %s, %s, %s, %s
         ) RETURNING *;
     """
-    # Use .get() with None as default - this properly handles null values from frontend
-    values = (
-        data.get('account_name'),  # Required field
-        data.get('opportunity', None),  # Optional - can be NULL
-        data.get('region_location', None),
-        data.get('region', None),
-        data.get('sub_region', None),
-        data.get('deal_value_usd', None),
-        data.get('scoping_doc', None),
-        data.get('vector_link', None),
-        data.get('charging_on_vector', None),
-        data.get('period_of_presales_weeks', None),
-        data.get('status', None),
-        data.get('assignee_from_gsd', None),
-        data.get('pursuit_lead', None),
-        data.get('delivery_manager', None),
-        data.get('presales_start_date', None),
-        data.get('expected_planned_start', None),
-        data.get('sow_signature_date', None),
-        data.get('staffing_completed_flag', False),  # Boolean - default to False
-        data.get('staffing_poc', None),
-        data.get('remarks', None),
-    )
+    values = _insert_values(data)
     
     try:
         cursor.execute(query, values)
         result = cursor.fetchone()
-        conn.commit()
         result_dict = _dict_from_row(cursor, result)
+        _apply_rollup_delta(cursor, result_dict, 1)
+        record_changes(cursor, [(result_dict['id'], 'insert')])
+        conn.commit()
         return result_dict
     except Exception as e:
         conn.rollback()
@@ -71,31 +387,226 @@ def create_record(data):
     finally:
         conn.close()
 
+# FILTERS
+def build_filter_clause(filters):
+    """
+    Build WHERE conditions for the list filters
+    
+    Args:
+        filters: dict with any of status, region, sub_region (lists of values),
+                 the RANGE_FILTERS keys, and q (free-text search)
+    
+    Returns:
+        (list of SQL conditions, list of parameters)
+    """
+    conditions = []
+    params = []
+    if not filters:
+        return conditions, params
+
+    for column in ('status', 'region', 'sub_region'):
+        values = filters.get(column)
+        if values:
+            conditions.append(f"{column} = ANY(%s)")
+            params.append(list(values))
+
+    for key, condition in RANGE_FILTERS.items():
+        if filters.get(key) is not None:
+            conditions.append(condition)
+            params.append(filters[key])
+
+    q = (filters.get('q') or '').strip()
+    if q:
+        # Word match through the tsvector index, substring match through the trigram index
+        escaped = q.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append(
+            f"(to_tsvector('simple', {SEARCH_TEXT_SQL}) @@ websearch_to_tsquery('simple', %s) "
+            f"OR lower({SEARCH_TEXT_SQL}) LIKE %s)"
+        )
+        params.extend([q, f"%{escaped}%"])
+
+    return conditions, params
+
+def get_filter_options():
+    """Distinct status / region / sub_region values for the filter dropdowns"""
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        options = {}
+        for column in ('status', 'region', 'sub_region'):
+            cursor.execute(
+                f"SELECT DISTINCT {column} FROM presales_tracking "
+                f"WHERE {column} IS NOT NULL ORDER BY {column}"
+            )
+            options[column] = [row[0] for row in cursor.fetchall()]
+        return options
+    finally:
+        conn.close()
+
 # READ ALL
-def get_all_records():
-    """Get all records"""
+def get_all_records(filters=None, as_rows=False):
+    """
+    Get all records matching the optional filters
+    as_rows=True returns dict with columns, types (Postgres OIDs) and rows instead of a list of dicts
+    """
+    conditions, params = build_filter_clause(filters)
+    query = "SELECT * FROM presales_tracking"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id ASC"
+
     conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM presales_tracking ORDER BY id ASC")
-    results = cursor.fetchall()
-    records = [_dict_from_row(cursor, row) for row in results]
-    conn.close()
-    return records
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+        if as_rows:
+            return {'columns': _columns(cursor), 'types': _column_types(cursor), 'rows': results}
+        return _dicts_from_rows(cursor, results)
+    finally:
+        conn.close()
+
+# READ PAGE
+def _encode_cursor(sort, order, value, record_id):
+    """Opaque keyset cursor pointing just after (value, record_id)"""
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    payload = json.dumps({'s': sort, 'o': order, 'v': value, 'id': record_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor_token, sort, order):
+    """Return (value, record_id) from a cursor, validating it matches the requested sort"""
+    try:
+        padded = cursor_token + '=' * (-len(cursor_token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, record_id = payload['v'], int(payload['id'])
+        cursor_sort, cursor_order = payload['s'], payload['o']
+        if value is not None and cursor_sort in SORTABLE_COLUMNS:
+            column_type = SORTABLE_COLUMNS[cursor_sort]
+            value = column_type.fromisoformat(value) if column_type is date else column_type(value)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or cursor_order != order:
+        raise ValueError("Cursor was issued for a different sort order")
+    return value, record_id
+
+def _keyset_clause(sort, order, value, record_id):
+    """
+    WHERE fragment selecting rows after the cursor position.
+    Rows are ordered by (sort, id) with NULL sort values last in both directions.
+    """
+    op = '>' if order == 'asc' else '<'
+    if sort == 'id':
+        return f"id {op} %s", [record_id]
+    if value is None:
+        return f"({sort} IS NULL AND id {op} %s)", [record_id]
+    return (
+        f"({sort} {op} %s OR ({sort} = %s AND id {op} %s) OR {sort} IS NULL)",
+        [value, value, record_id],
+    )
+
+def get_estimated_count(filters=None):
+    """
+    Planner row estimate - cheap, no table scan
+    Uses pg_class for the whole table, or the EXPLAIN row estimate when filtered
+    """
+    conditions, params = build_filter_clause(filters)
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        if not conditions:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = 'presales_tracking'::regclass")
+            result = cursor.fetchone()
+            return max(int(result[0]), 0) if result else None
+        cursor.execute(
+            "EXPLAIN (FORMAT JSON) SELECT 1 FROM presales_tracking WHERE " + " AND ".join(conditions),
+            params,
+        )
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    finally:
+        conn.close()
+
+def get_records_page(limit=DEFAULT_PAGE_SIZE, cursor_token=None, sort='id', order='asc',
+                     include_total=False, filters=None, as_rows=False):
+    """
+    Get one page of records matching the optional filters using keyset pagination
+    Returns dict with data, next_cursor (None on the last page) and optionally estimated_total
+    as_rows=True returns columns, types (Postgres OIDs) and rows (in column order) in place of data
+    """
+    if sort not in SORTABLE_COLUMNS:
+        raise ValueError(f"Invalid sort column. Must be one of: {', '.join(sorted(SORTABLE_COLUMNS))}")
+    order = (order or 'asc').lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError("Invalid order. Must be 'asc' or 'desc'")
+    limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+
+    where, params = build_filter_clause(filters)
+    if cursor_token:
+        value, record_id = _decode_cursor(cursor_token, sort, order)
+        clause, clause_params = _keyset_clause(sort, order, value, record_id)
+        where.append(clause)
+        params.extend(clause_params)
+
+    direction = 'ASC' if order == 'asc' else 'DESC'
+    order_by = f"id {direction}" if sort == 'id' else f"{sort} {direction} NULLS LAST, id {direction}"
+    query = "SELECT * FROM presales_tracking"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    # Fetch one extra row to know whether another page exists
+    query += f" ORDER BY {order_by} LIMIT %s"
+    params.append(limit + 1)
+
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        columns = _columns(cursor)
+        types = _column_types(cursor)
+    finally:
+        conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = _encode_cursor(sort, order, last[columns.index(sort)], last[columns.index('id')])
+
+    if as_rows:
+        page = {'columns': columns, 'types': types, 'rows': rows}
+    else:
+        page = {'data': [dict(zip(columns, row)) for row in rows]}
+    page.update({'count': len(rows), 'limit': limit, 'next_cursor': next_cursor})
+    if include_total:
+        page['estimated_total'] = get_estimated_count(filters)
+    return page
 
 # READ ONE
 def get_record_by_id(record_id):
     """Get single record by ID"""
     conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM presales_tracking WHERE id = %s", (record_id,))
-    result = cursor.fetchone()
-    result_dict = _dict_from_row(cursor, result)
-    conn.close()
-    return result_dict
+    try:
+        cursor = conn.execute_prepared("SELECT * FROM presales_tracking WHERE id = %s", (record_id,))
+        result = cursor.fetchone()
+        return _dict_from_row(cursor, result)
+    finally:
+        conn.close()
 
 # UPDATE
-def update_record(record_id, data):
-    """Update record by ID - properly handles NULL values"""
+def update_record(record_id, data, precondition=None):
+    """
+    Update record by ID - properly handles NULL values
+    
+    Args:
+        precondition: Optional callable(current_record) -> bool checked under the row lock;
+                      when it returns False nothing is written and PreconditionFailed is raised
+    """
     conn = get_db()
     cursor = conn.cursor()
     
@@ -104,7 +615,8 @@ def update_record(record_id, data):
     updates = []
     values = []
     
-    for key in ALLOWED_COLUMNS:
+    # Canonical column order keeps the SQL text - and so its prepared statement - stable
+    for key in INSERT_COLUMNS:
         if key in data:  # Only update fields that are present in the data dict
             updates.append(f"{key} = %s")
             values.append(data[key])  # Include even if None - this sets to NULL
@@ -113,14 +625,25 @@ def update_record(record_id, data):
         conn.close()
         return None
     
+    updates.append("updated_at = now()")
     values.append(record_id)
     query = f"UPDATE presales_tracking SET {', '.join(updates)} WHERE id = %s RETURNING *"
     
     try:
-        cursor.execute(query, values)
-        result = cursor.fetchone()
+        # Lock the current row so its rollup contribution can be moved atomically
+        locked = conn.execute_prepared("SELECT * FROM presales_tracking WHERE id = %s FOR UPDATE", (record_id,))
+        old_dict = _dict_from_row(locked, locked.fetchone())
+        if old_dict is None:
+            return None
+        if precondition is not None and not precondition(old_dict):
+            raise PreconditionFailed(f"Record {record_id} was modified by someone else")
+        
+        updated = conn.execute_prepared(query, values)
+        result_dict = _dict_from_row(updated, updated.fetchone())
+        _apply_rollup_delta(cursor, old_dict, -1)
+        _apply_rollup_delta(cursor, result_dict, 1)
+        record_changes(cursor, [(record_id, 'update')])
         conn.commit()
-        result_dict = _dict_from_row(cursor, result)
         return result_dict
     except Exception as e:
         conn.rollback()
@@ -134,12 +657,228 @@ def delete_record(record_id):
     conn = get_db()
     cursor = conn.cursor()
     try:
-        cursor.execute("DELETE FROM presales_tracking WHERE id = %s RETURNING id", (record_id,))
+        cursor.execute("DELETE FROM presales_tracking WHERE id = %s RETURNING *", (record_id,))
         result = cursor.fetchone()
+        if result is not None:
+            _apply_rollup_delta(cursor, _dict_from_row(cursor, result), -1)
+            record_changes(cursor, [(record_id, 'delete')])
         conn.commit()
         return result is not None
     except Exception as e:
         conn.rollback()
         raise e
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+# BULK
+BULK_MAX_ITEMS = 1000
+
+def _error_result(error):
+    return {'status': 'error', 'error': str(error)}
+
+def _bulk_insert(cursor, rows):
+    """Multi-row INSERT ... RETURNING * for rows (list of dicts), in input order"""
+    placeholders = '(' + ', '.join(['%s'] * len(INSERT_COLUMNS)) + ')'
+    query = (
+        f"INSERT INTO presales_tracking ({', '.join(INSERT_COLUMNS)}) "
+        f"VALUES {', '.join([placeholders] * len(rows))} RETURNING *"
+    )
+    params = [value for row in rows for value in _insert_values(row)]
+    cursor.execute(query, params)
+    created = _dicts_from_rows(cursor, cursor.fetchall())
+    for record in created:
+        _apply_rollup_delta(cursor, record, 1)
+    return created
+
+def _bulk_update_group(cursor, fields, items, old_rows):
+    """
+    UPDATE ... FROM (VALUES ...) for items that all set the same fields
+    Returns updated records keyed by id
+    """
+    row_sql = '(%s::bigint, ' + ', '.join(
+        f"%s::{COLUMN_TYPES.get(field, 'text')}" for field in fields
+    ) + ')'
+    assignments = ', '.join(f"{field} = v.{field}" for field in fields) + ", updated_at = now()"
+    query = (
+        f"UPDATE presales_tracking AS t SET {assignments} "
+        f"FROM (VALUES {', '.join([row_sql] * len(items))}) AS v(id, {', '.join(fields)}) "
+        f"WHERE t.id = v.id RETURNING t.*"
+    )
+    params = []
+    for item in items:
+        params.append(item['id'])
+        params.extend(item['data'][field] for field in fields)
+    cursor.execute(query, params)
+    updated = {}
+    # Materialize first - the rollup statements below replace the cursor's result set
+    for record in _dicts_from_rows(cursor, cursor.fetchall()):
+        _apply_rollup_delta(cursor, old_rows[record['id']], -1)
+        _apply_rollup_delta(cursor, record, 1)
+        updated[record['id']] = record
+    return updated
+
+def _lock_rows(cursor, ids):
+    cursor.execute("SELECT * FROM presales_tracking WHERE id = ANY(%s) FOR UPDATE", (list(ids),))
+    return {record['id']: record for record in _dicts_from_rows(cursor, cursor.fetchall())}
+
+def bulk_create_records(rows, atomic=True):
+    """
+    Insert many records in one transaction
+    
+    Args:
+        rows: list of record dicts (same shape as create_record)
+        atomic: True - one multi-row INSERT, all rows or none
+                False - best effort, each row under its own savepoint
+    
+    Returns:
+        list of per-row results {'status': 'created', 'data': ...} or {'status': 'error', 'error': ...}
+    
+    Raises:
+        Database errors in atomic mode (nothing is written)
+    """
+    if not rows:
+        return []
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        if atomic:
+            results = [{'status': 'created', 'data': record} for record in _bulk_insert(cursor, rows)]
+        else:
+            results = []
+            for row in rows:
+                cursor.execute("SAVEPOINT bulk_row")
+                try:
+                    record = _bulk_insert(cursor, [row])[0]
+                    cursor.execute("RELEASE SAVEPOINT bulk_row")
+                    results.append({'status': 'created', 'data': record})
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT bulk_row")
+                    results.append(_error_result(e))
+        changes = [(r['data']['id'], 'insert') for r in results if r['status'] == 'created']
+        if changes:
+            record_changes(cursor, changes)
+        conn.commit()
+        return results
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def bulk_update_records(items, atomic=True):
+    """
+    Update many records in one transaction
+    
+    Args:
+        items: list of {'id': record_id, 'data': {field: value}} - only the given fields are updated
+        atomic: True - all rows or none; missing ids fail the whole batch
+                False - best effort, each row under its own savepoint
+    
+    Returns:
+        list of per-row results {'status': 'updated', 'data': ...} or {'status': 'error', 'error': ...}
+    
+    Raises:
+        In atomic mode (nothing is written): LookupError when some ids do not exist,
+        ValueError when an item has no fields, and database errors
+    """
+    if not items:
+        return []
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        old_rows = _lock_rows(cursor, {item['id'] for item in items})
+        results = [None] * len(items)
+
+        if atomic:
+            missing = sorted({item['id'] for item in items if item['id'] not in old_rows})
+            if missing:
+                raise LookupError(f"Records not found: {', '.join(str(i) for i in missing)}")
+            # One statement per distinct set of updated fields, canonical column order
+            groups = {}
+            for index, item in enumerate(items):
+                fields = tuple(sorted(f for f in item['data'] if f in ALLOWED_COLUMNS))
+                if not fields:
+                    raise ValueError(f"No data provided for update of record {item['id']}")
+                groups.setdefault(fields, []).append(index)
+            for fields, indexes in groups.items():
+                # A VALUES list may hold each id once; later duplicates go to the next statement
+                batches = [[]]
+                for index in indexes:
+                    if any(items[i]['id'] == items[index]['id'] for i in batches[-1]):
+                        batches.append([])
+                    batches[-1].append(index)
+                for batch in batches:
+                    updated = _bulk_update_group(cursor, fields, [items[i] for i in batch], old_rows)
+                    old_rows.update(updated)
+                    for index in batch:
+                        results[index] = {'status': 'updated', 'data': updated[items[index]['id']]}
+        else:
+            for index, item in enumerate(items):
+                fields = tuple(sorted(f for f in item['data'] if f in ALLOWED_COLUMNS))
+                if item['id'] not in old_rows:
+                    results[index] = _error_result("Record not found")
+                    continue
+                if not fields:
+                    results[index] = _error_result("No data provided for update")
+                    continue
+                cursor.execute("SAVEPOINT bulk_row")
+                try:
+                    updated = _bulk_update_group(cursor, fields, [item], old_rows)
+                    cursor.execute("RELEASE SAVEPOINT bulk_row")
+                    old_rows.update(updated)
+                    results[index] = {'status': 'updated', 'data': updated[item['id']]}
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT bulk_row")
+                    results[index] = _error_result(e)
+        changes = [(r['data']['id'], 'update') for r in results if r['status'] == 'updated']
+        if changes:
+            record_changes(cursor, changes)
+        conn.commit()
+        return results
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def bulk_delete_records(record_ids, atomic=True):
+    """
+    Delete many records with one DELETE ... WHERE id = ANY(...)
+    
+    Returns:
+        list of per-id results {'status': 'deleted'} or {'status': 'error', 'error': 'Record not found'}
+    
+    Raises:
+        LookupError (atomic mode, nothing deleted) when some ids do not exist
+    """
+    if not record_ids:
+        return []
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM presales_tracking WHERE id = ANY(%s) RETURNING *", (list(set(record_ids)),))
+        deleted = {record['id']: record for record in _dicts_from_rows(cursor, cursor.fetchall())}
+        missing = sorted({record_id for record_id in record_ids if record_id not in deleted})
+        if atomic and missing:
+            raise LookupError(f"Records not found: {', '.join(str(i) for i in missing)}")
+        for record in deleted.values():
+            _apply_rollup_delta(cursor, record, -1)
+        if deleted:
+            record_changes(cursor, [(record_id, 'delete') for record_id in deleted])
+        conn.commit()
+        return [
+            {'status': 'deleted', 'id': record_id} if record_id in deleted
+            else {'status': 'error', 'id': record_id, 'error': 'Record not found'}
+            for record_id in record_ids
+        ]
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["prune-changes"]:
+        print("Usage: python crud.py prune-changes")
+        sys.exit(1)
+    print(f" Pruned {prune_change_log()} change log entries older than {CHANGE_LOG_RETENTION_DAYS} days")
@@ -0,0 +1,289 @@
+"""
+Email Outbox Module
+Durable outbound email queue (email_outbox table) drained by a background
+worker over one persistent, authenticated SMTP session.
+
+- email_service.send_email() enqueues when EMAIL_DELIVERY_MODE=outbox
+- The worker claims due rows with FOR UPDATE SKIP LOCKED, so several
+  instances can drain the same table safely
+- Failed sends are retried with exponential backoff; after
+  EMAIL_OUTBOX_MAX_ATTEMPTS the row is moved to the 'dead' state
+
+For local testing run a debugging SMTP server, e.g.
+    python -m aiosmtpd -n -l localhost:1025
+with SMTP_SERVER=localhost SMTP_PORT=1025 SMTP_USE_TLS=false SMTP_AUTH=false
+"""
+
+import os
+import time
+import logging
+import threading
+from dotenv import load_dotenv
+from database import get_db
+import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_FROM_EMAIL = os.getenv("SMTP_FROM_EMAIL")
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+SMTP_AUTH = os.getenv("SMTP_AUTH", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))  # Close the session after this long without mail
+
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", "5"))
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "20"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "6"))
+EMAIL_OUTBOX_BACKOFF_BASE = float(os.getenv("EMAIL_OUTBOX_BACKOFF_BASE", "30"))  # Seconds before the first retry
+EMAIL_OUTBOX_BACKOFF_MAX = float(os.getenv("EMAIL_OUTBOX_BACKOFF_MAX", "3600"))
+EMAIL_OUTBOX_LEASE_SECONDS = int(os.getenv("EMAIL_OUTBOX_LEASE_SECONDS", "300"))  # Claimed rows are retried after this if a worker dies
+
+_wakeup = threading.Event()
+_worker = None
+
+def enqueue_email(to_email: str, subject: str, body: str, cursor=None):
+    """
+    Store a message in the outbox
+    Pass cursor to enqueue inside the caller's transaction; otherwise a pooled
+    connection is used and committed immediately
+
+    Returns:
+        int: Outbox row id
+    """
+    query = """
+        INSERT INTO email_outbox (to_email, subject, body)
+        VALUES (%s, %s, %s)
+        RETURNING id;
+    """
+    if cursor is not None:
+        cursor.execute(query, (to_email, subject, body))
+        outbox_id = cursor.fetchone()[0]
+    else:
+        conn = get_db()
+        try:
+            own_cursor = conn.cursor()
+            own_cursor.execute(query, (to_email, subject, body))
+            outbox_id = own_cursor.fetchone()[0]
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+    _wakeup.set()
+    return outbox_id
+
+def build_message(to_email: str, subject: str, body: str):
+    """Plain-text MIME message from SMTP_FROM_EMAIL"""
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
+    message = MIMEMultipart()
+    message['From'] = SMTP_FROM_EMAIL or SMTP_USERNAME
+    message['To'] = to_email
+    message['Subject'] = subject
+    message.attach(MIMEText(body, 'plain'))
+    return message
+
+def connect_smtp():
+    """Open an SMTP session with the SMTP_* settings (TLS and login when enabled)"""
+    import smtplib  # Deferred until there is mail to send - keeps it off the cold start path
+    started = time.perf_counter()
+    server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    try:
+        if SMTP_USE_TLS:
+            server.starttls()
+        if SMTP_AUTH:
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    metrics.observe_smtp("connect", time.perf_counter() - started)
+    logger.info(f"SMTP session opened to {SMTP_SERVER}:{SMTP_PORT}")
+    return server
+
+def backoff_seconds(attempts: int):
+    """Delay before the next attempt after `attempts` failures"""
+    return min(EMAIL_OUTBOX_BACKOFF_BASE * (2 ** max(attempts - 1, 0)), EMAIL_OUTBOX_BACKOFF_MAX)
+
+class SMTPSession:
+    """
+    Lazily opened SMTP connection reused across messages
+    Reconnects transparently when the server drops the session
+    """
+
+    def __init__(self):
+        self._server = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        return connect_smtp()
+
+    def _alive(self):
+        import smtplib
+        try:
+            return self._server.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    def send(self, to_email: str, subject: str, body: str):
+        """Send one message, reconnecting once if the session went away"""
+        import smtplib
+
+        message = build_message(to_email, subject, body)
+        for attempt in (1, 2):
+            if self._server is None:
+                self._server = self._connect()
+            try:
+                started = time.perf_counter()
+                self._server.send_message(message)
+                metrics.observe_smtp("send", time.perf_counter() - started)
+                self._last_used = time.monotonic()
+                return
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self.close()
+                if attempt == 2:
+                    raise
+
+    def close_if_idle(self):
+        """Drop the session when it has not been used for SMTP_IDLE_TIMEOUT"""
+        if self._server is not None and time.monotonic() - self._last_used > SMTP_IDLE_TIMEOUT:
+            self.close()
+        elif self._server is not None and not self._alive():
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+def _claim_batch():
+    """Lease due messages to this worker"""
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            UPDATE email_outbox
+            SET next_attempt_at = now() + make_interval(secs => %s)
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE status = 'pending' AND next_attempt_at <= now()
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, to_email, subject, body, attempts;
+            """,
+            (EMAIL_OUTBOX_LEASE_SECONDS, EMAIL_OUTBOX_BATCH_SIZE),
+        )
+        rows = cursor.fetchall()
+        conn.commit()
+        return rows
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def _mark_sent(outbox_id):
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE email_outbox SET status = 'sent', sent_at = now(), last_error = NULL WHERE id = %s",
+            (outbox_id,),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def _mark_failed(outbox_id, attempts, error):
+    """Schedule a retry with backoff, or dead-letter the message"""
+    dead = attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE email_outbox
+            SET attempts = %s,
+                status = %s,
+                last_error = %s,
+                next_attempt_at = now() + make_interval(secs => %s)
+            WHERE id = %s
+            """,
+            (attempts, 'dead' if dead else 'pending', str(error)[:1000], backoff_seconds(attempts), outbox_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    if dead:
+        logger.error(f"Email {outbox_id} moved to dead letter after {attempts} attempts: {error}")
+    else:
+        logger.warning(f"Email {outbox_id} failed (attempt {attempts}), retrying: {error}")
+
+def drain_once(session: SMTPSession):
+    """Send every message that is currently due; returns how many were processed"""
+    rows = _claim_batch()
+    for outbox_id, to_email, subject, body, attempts in rows:
+        try:
+            session.send(to_email, subject, body)
+        except Exception as e:
+            _mark_failed(outbox_id, attempts + 1, e)
+            continue
+        _mark_sent(outbox_id)
+        logger.info(f"Email {outbox_id} sent to {to_email}")
+    return len(rows)
+
+class OutboxWorker(threading.Thread):
+    """Background thread draining the outbox until stop() is called"""
+
+    def __init__(self):
+        super().__init__(name="email-outbox", daemon=True)
+        self._stopping = threading.Event()
+        self.session = SMTPSession()
+
+    def run(self):
+        while not self._stopping.is_set():
+            _wakeup.clear()
+            try:
+                processed = drain_once(self.session)
+            except Exception as e:
+                logger.error(f"Email outbox worker error: {e}")
+                processed = 0
+            if processed >= EMAIL_OUTBOX_BATCH_SIZE:
+                continue  # More may be waiting
+            self.session.close_if_idle()
+            _wakeup.wait(EMAIL_OUTBOX_POLL_INTERVAL)
+        self.session.close()
+
+    def stop(self, timeout=10):
+        self._stopping.set()
+        _wakeup.set()
+        self.join(timeout)
+
+def start_worker():
+    """Start the outbox worker for this process (idempotent)"""
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        _worker = OutboxWorker()
+        _worker.start()
+    return _worker
+
+def stop_worker():
+    """Stop the outbox worker, closing its SMTP session"""
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
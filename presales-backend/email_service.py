@@ -4,11 +4,15 @@ Sends notification emails for user management with approval/rejection flow
 Production-ready version for Cloud Run deployment
 """
 
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
 import os
+import functools
 from dotenv import load_dotenv
+import workers
+import email_outbox
+import metrics
+# SMTP settings (App Password method) are shared with the outbox worker
+from email_outbox import SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_FROM_EMAIL, SMTP_AUTH
 
 load_dotenv()
 
@@ -16,14 +20,12 @@ load_dotenv()
 ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
 APP_BASE_URL = os.getenv("APP_BASE_URL", "https://presales-backend-455538062800.us-central1.run.app")
 
-# SMTP Settings (App Password Method)
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
-SMTP_USERNAME = os.getenv("SMTP_USERNAME")  # Your Gmail address
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")  # Your Gmail App Password
-SMTP_FROM_EMAIL = os.getenv("SMTP_FROM_EMAIL")  # Email address shown as sender
+# Delivery mode:
+#   outbox - store in the email_outbox table; email_outbox's worker sends it (default)
+#   direct - open an SMTP session per message on the email executor
+EMAIL_DELIVERY_MODE = os.getenv("EMAIL_DELIVERY_MODE", "outbox").lower()
 
-def send_invite_email(user_email: str, user_name: str, role: str, admin_name: str, invite_token: str):
+def send_invite_email(user_email: str, user_name: str, role: str, admin_name: str, invite_token: str, cursor=None):
     """
     Send invitation email to user with approve/reject links
     
@@ -33,6 +35,7 @@ def send_invite_email(user_email: str, user_name: str, role: str, admin_name: st
         role: User's role (presales_viewer, presales_creator, presales_admin)
         admin_name: Name of the admin who added them
         invite_token: Unique invite token for this invitation
+        cursor: Cursor of the caller's transaction (see send_email)
     
     Returns:
         bool: True if email sent successfully, False otherwise
@@ -105,9 +108,9 @@ Best regards,
 The Flux Team
     """
     
-    return send_email(user_email, subject, body)
+    return send_email(user_email, subject, body, cursor)
 
-def send_approval_notification_to_admin(user_email: str, user_name: str, admin_email: str):
+def send_approval_notification_to_admin(user_email: str, user_name: str, admin_email: str, cursor=None):
     """
     Notify admin that user accepted the invitation
     
@@ -137,9 +140,9 @@ Best regards,
 The Flux Team
     """
     
-    return send_email(admin_email, subject, body)
+    return send_email(admin_email, subject, body, cursor)
 
-def send_rejection_notification_to_admin(user_email: str, user_name: str, admin_email: str):
+def send_rejection_notification_to_admin(user_email: str, user_name: str, admin_email: str, cursor=None):
     """
     Notify admin that user rejected the invitation
     
@@ -169,7 +172,7 @@ Best regards,
 The Flux Team
     """
     
-    return send_email(admin_email, subject, body)
+    return send_email(admin_email, subject, body, cursor)
 
 def send_user_added_email(user_email: str, user_name: str, role: str, admin_name: str):
     """
@@ -180,7 +183,7 @@ def send_user_added_email(user_email: str, user_name: str, role: str, admin_name
     print(" Warning: send_user_added_email is deprecated. Use send_invite_email instead.")
     return False
 
-def send_role_changed_email(user_email: str, user_name: str, old_role: str, new_role: str, admin_name: str):
+def send_role_changed_email(user_email: str, user_name: str, old_role: str, new_role: str, admin_name: str, cursor=None):
     """
     Send email to user when their role is changed by an admin
     """
@@ -233,9 +236,9 @@ Best regards,
 The Flux Team
     """
     
-    return send_email(user_email, subject, body)
+    return send_email(user_email, subject, body, cursor)
 
-def send_user_removed_email(user_email: str, user_name: str, admin_name: str):
+def send_user_removed_email(user_email: str, user_name: str, admin_name: str, cursor=None):
     """
     Send email to user when they are removed from the system by an admin
     """
@@ -259,54 +262,74 @@ Best regards,
 The Flux Team
     """
     
-    return send_email(user_email, subject, body)
+    return send_email(user_email, subject, body, cursor)
 
-def send_email(to_email: str, subject: str, body: str):
+def send_email(to_email: str, subject: str, body: str, cursor=None):
     """
     Send email using SMTP with app password
+    In outbox mode the message is stored in email_outbox and sent by the
+    background worker; in direct mode with BLOCKING_IO_MODE=threadpool the SMTP
+    session runs on the email executor. Either way this returns once the
+    message is handed off
+    
+    With cursor the message belongs to the caller's transaction: in outbox mode
+    the row is inserted on that cursor (a failure raises, so the change it
+    announces rolls back too), in direct mode it is sent once the transaction
+    commits and dropped if it rolls back
     
     Args:
         to_email: Recipient email address
         subject: Email subject
         body: Email body (plain text)
+        cursor: Cursor of the caller's open transaction (optional)
     
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if email sent (or handed off) successfully, False otherwise
     """
+    if SMTP_AUTH and (not SMTP_USERNAME or not SMTP_PASSWORD):
+        print(" SMTP credentials not configured")
+        print("   Please set SMTP_USERNAME and SMTP_PASSWORD in .env")
+        return False
+    
+    if EMAIL_DELIVERY_MODE == "outbox" and cursor is not None:
+        outbox_id = email_outbox.enqueue_email(to_email, subject, body, cursor=cursor)
+        print(f" Email to {to_email} queued (outbox id {outbox_id})")
+        return True
+    
+    if EMAIL_DELIVERY_MODE == "outbox":
+        try:
+            outbox_id = email_outbox.enqueue_email(to_email, subject, body)
+            print(f" Email to {to_email} queued (outbox id {outbox_id})")
+            return True
+        except Exception as e:
+            print(f" Failed to queue email to {to_email}")
+            print(f"   Error: {e}")
+            return False
+    
+    if cursor is not None:
+        cursor.connection.after_commit(functools.partial(workers.submit_email, _deliver_email, to_email, subject, body))
+        return True
+    
+    result = workers.submit_email(_deliver_email, to_email, subject, body)
+    return result if isinstance(result, bool) else True
+
+def _deliver_email(to_email: str, subject: str, body: str):
+    """Open an SMTP session and send a single message"""
+    # Imported here so the API can start without loading the email stack
+    import smtplib
+    
     try:
         print(f" Preparing to send email to {to_email}")
+        message = email_outbox.build_message(to_email, subject, body)
         
-        # Validate configuration
-        if not SMTP_USERNAME or not SMTP_PASSWORD:
-            print(" SMTP credentials not configured")
-            print("   Please set SMTP_USERNAME and SMTP_PASSWORD in .env")
-            return False
-        
-        # Create message
-        message = MIMEMultipart()
-        message['From'] = SMTP_FROM_EMAIL or SMTP_USERNAME
-        message['To'] = to_email
-        message['Subject'] = subject
-        
-        message.attach(MIMEText(body, 'plain'))
-        
-        # Connect to SMTP server and send email
+        # Connect (TLS / login per SMTP_USE_TLS / SMTP_AUTH, like the outbox worker) and send
         print(f" Connecting to {SMTP_SERVER}:{SMTP_PORT}...")
         
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.set_debuglevel(0)  # Set to 1 for verbose debugging
-            
-            # Start TLS encryption
-            print(" Starting TLS encryption...")
-            server.starttls()
-            
-            # Login
-            print(" Logging in...")
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            
-            # Send email
+        started = time.perf_counter()
+        with email_outbox.connect_smtp() as server:
             print("Sending email...")
             server.send_message(message)
+        metrics.observe_smtp("deliver", time.perf_counter() - started)
         
         print(f" Email sent successfully to {to_email}")
         return True
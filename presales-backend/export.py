@@ -0,0 +1,233 @@
+"""
+Export Module
+Streams opportunities as CSV, NDJSON, XLSX, MessagePack or Arrow IPC using a
+server-side cursor so memory stays flat regardless of table size and the first
+rows go out before the query has finished
+
+An export holds a pooled connection until its last row is fetched, so at most
+EXPORT_MAX_CONCURRENT run at once (ExportBusy otherwise) and every fetch runs on
+the bounded DB executor (open_export) - slow downloads cannot drain the pool
+the API requests need.
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from database import get_db
+from crud import build_filter_clause
+import serializers
+import workers
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Exports allowed to hold a pooled connection at the same time
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+EXPORT_RETRY_AFTER_SECONDS = 30
+
+_export_slots = threading.BoundedSemaphore(max(EXPORT_MAX_CONCURRENT, 1))
+
+class ExportBusy(Exception):
+    """Every export slot is taken"""
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'msgpack': 'application/msgpack',
+    'arrow': serializers.ARROW_STREAM_MEDIA_TYPE,
+}
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def iter_record_batches(filters=None, batch_size=EXPORT_BATCH_SIZE, with_types=False):
+    """
+    Yield (columns, rows) batches of records matching the filters, ordered by id
+    with_types=True yields (columns, types, rows) with the Postgres type OIDs
+    Uses DECLARE/FETCH so only one batch is held in memory at a time
+    """
+    conditions, params = build_filter_clause(filters)
+    query = "SELECT * FROM presales_tracking"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id ASC"
+
+    if not _export_slots.acquire(blocking=False):
+        raise ExportBusy(f"Too many exports in progress. Please retry in {EXPORT_RETRY_AFTER_SECONDS} seconds.")
+    try:
+        yield from _fetch_batches(query, params, batch_size, with_types)
+    finally:
+        _export_slots.release()
+
+def _fetch_batches(query, params, batch_size, with_types):
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        # Cursors only live inside a transaction; pg8000 opens one implicitly
+        cursor.execute(f"DECLARE export_cursor NO SCROLL CURSOR FOR {query}", params)
+        while True:
+            cursor.execute(f"FETCH FORWARD {int(batch_size)} FROM export_cursor")
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            columns = [desc[0] for desc in cursor.description]
+            if with_types:
+                yield columns, [desc[1] for desc in cursor.description], rows
+            else:
+                yield columns, rows
+        cursor.execute("CLOSE export_cursor")
+    finally:
+        # Returning the connection rolls back the read-only transaction
+        conn.close()
+
+def stream_csv(filters=None):
+    """CSV chunks - header row first"""
+    header_written = False
+    for columns, rows in iter_record_batches(filters):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+
+def stream_ndjson(filters=None):
+    """One JSON object per line"""
+    for columns, rows in iter_record_batches(filters):
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), default=_json_default) + '\n' for row in rows
+        ).encode('utf-8')
+
+def stream_xlsx(filters=None, chunk_size=64 * 1024):
+    """
+    XLSX workbook
+    A zip container can only be finished at the end, so rows are written with
+    openpyxl's write-only mode to a spooled temporary file and then streamed out
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Opportunities")
+    header_written = False
+    for columns, rows in iter_record_batches(filters):
+        if not header_written:
+            sheet.append(columns)
+            header_written = True
+        for row in rows:
+            sheet.append([float(v) if isinstance(v, Decimal) else v for v in row])
+
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def stream_msgpack(filters=None):
+    """A sequence of MessagePack maps, one per record (read with msgpack.Unpacker)"""
+    for columns, rows in iter_record_batches(filters):
+        yield b''.join(serializers.packb(dict(zip(columns, row))) for row in rows)
+
+def _drain(buffer):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+def stream_arrow(filters=None):
+    """Arrow IPC stream, one record batch per fetched batch - the schema comes from the column types"""
+    import pyarrow as pa
+
+    buffer = io.BytesIO()
+    writer = None
+    for columns, types, rows in iter_record_batches(filters, with_types=True):
+        if writer is None:
+            schema = serializers.arrow_schema(columns, types)
+            writer = pa.ipc.new_stream(buffer, schema)
+        writer.write_batch(serializers.arrow_batch(schema, rows))
+        yield _drain(buffer)
+    if writer is None:
+        # No rows at all - still a valid (empty) stream
+        yield serializers.arrow_stream(pa.schema([]), [])
+        return
+    writer.close()
+    yield _drain(buffer)
+
+STREAMERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+    'xlsx': stream_xlsx,
+    'msgpack': stream_msgpack,
+    'arrow': stream_arrow,
+}
+
+def export_stream(export_format, filters=None):
+    """Generator of encoded chunks for the given format"""
+    if export_format not in STREAMERS:
+        raise ValueError(f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}")
+    # Fail before the response starts rather than halfway through it
+    if export_format == 'xlsx':
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise ValueError("xlsx export requires the openpyxl package")
+    if export_format == 'msgpack' and serializers.msgpack is None:
+        raise ValueError("msgpack export requires the msgpack package")
+    if export_format == 'arrow':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("arrow export requires the pyarrow package")
+    return STREAMERS[export_format](filters)
+
+_DONE = object()
+
+async def open_export(export_format, filters=None):
+    """
+    Async iterator of encoded chunks for a StreamingResponse
+    The first chunk is produced before returning, so a busy or failing export is
+    still an HTTP error rather than a truncated download. Each chunk is produced
+    on the DB executor, and the stream - with its connection and export slot -
+    is closed however the response ends, including a client disconnect.
+
+    Raises:
+        ValueError for an unknown or unavailable format
+        ExportBusy when EXPORT_MAX_CONCURRENT exports are already running
+    """
+    stream = export_stream(export_format, filters)
+    # Serializes the fetches with the final close, which may be queued while a fetch is still running
+    guard = threading.Lock()
+
+    def step():
+        with guard:
+            return next(stream, _DONE)
+
+    def close():
+        with guard:
+            stream.close()
+
+    try:
+        first = await workers.run_db(step)
+    except BaseException:
+        workers.submit_db(close)
+        raise
+    return _chunks(first, step, close)
+
+async def _chunks(chunk, step, close):
+    try:
+        while chunk is not _DONE:
+            yield chunk
+            chunk = await workers.run_db(step)
+    finally:
+        workers.submit_db(close)
@@ -0,0 +1,239 @@
+"""
+Google ID Token Verification
+Checks the ID tokens posted to /auth/google without downloading Google's
+signing certificates on every login.
+
+- One shared requests.Session keeps the connection to googleapis.com alive
+- The certificates are cached for the max-age of their Cache-Control header
+  and looked up by the token's key ID (kid); a kid that is not cached (Google
+  rotated its keys) refreshes them, at most once per GOOGLE_CERTS_MIN_REFRESH_SECONDS
+- Concurrent logins share a single refresh; if Google cannot be reached the
+  expired certificates are still used
+- Verified tokens are cached by SHA-256 until shortly before they expire, so
+  a retried login skips the signature check. The key covers the audience and
+  the whole token, signature included - any altered token misses the cache
+  and is verified in full
+
+verify() is blocking - main.py runs it through workers.run_blocking.
+"""
+
+import os
+import re
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+import metrics
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_CERTS_TIMEOUT_SECONDS = float(os.getenv("GOOGLE_CERTS_TIMEOUT_SECONDS", "10"))
+# Used when the response has no usable Cache-Control max-age
+GOOGLE_CERTS_DEFAULT_TTL_SECONDS = float(os.getenv("GOOGLE_CERTS_DEFAULT_TTL_SECONDS", "3600"))
+# Unknown key IDs refresh the certificates no more often than this
+GOOGLE_CERTS_MIN_REFRESH_SECONDS = float(os.getenv("GOOGLE_CERTS_MIN_REFRESH_SECONDS", "60"))
+GOOGLE_CLOCK_SKEW_SECONDS = int(os.getenv("GOOGLE_CLOCK_SKEW_SECONDS", "0"))
+
+ID_TOKEN_CACHE_ENABLED = os.getenv("ID_TOKEN_CACHE_ENABLED", "true").lower() == "true"
+ID_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("ID_TOKEN_CACHE_TTL_SECONDS", "300"))
+ID_TOKEN_CACHE_MAX_SIZE = int(os.getenv("ID_TOKEN_CACHE_MAX_SIZE", "1024"))
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+_MAX_AGE = re.compile(r"(?:^|[,\s])max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+token_cache = TTLCache(
+    max_size=ID_TOKEN_CACHE_MAX_SIZE,
+    ttl=ID_TOKEN_CACHE_TTL_SECONDS,
+    enabled=ID_TOKEN_CACHE_ENABLED,
+)
+
+def cache_ttl(headers, default=GOOGLE_CERTS_DEFAULT_TTL_SECONDS):
+    """Seconds a response stays fresh from its Cache-Control max-age minus Age"""
+    cache_control = headers.get("Cache-Control") or ""
+    if "no-store" in cache_control.lower() or "no-cache" in cache_control.lower():
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    if not match:
+        return default
+    try:
+        age = int(headers.get("Age") or 0)
+    except ValueError:
+        age = 0
+    return max(int(match.group(1)) - age, 0)
+
+class CertificateCache:
+    """
+    Google's signing certificates ({kid: PEM}) fetched over a shared session
+
+    Args:
+        url: Certificate endpoint
+        session: requests.Session to use; one is created on first fetch when omitted
+    """
+
+    def __init__(self, url=GOOGLE_CERTS_URL, session=None):
+        self.url = url
+        self._session = session
+        self._certs = {}
+        self._expires_at = 0.0
+        self._fetched_at = None
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.failures = 0
+
+    def _get_session(self):
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    def _fresh(self):
+        return bool(self._certs) and time.monotonic() < self._expires_at
+
+    def _refresh(self):
+        """Fetch the certificates - call with the lock held"""
+        response = self._get_session().get(self.url, timeout=GOOGLE_CERTS_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        certs = response.json()
+        if not isinstance(certs, dict) or not certs:
+            raise ValueError(f"Unexpected certificate response from {self.url}")
+        now = time.monotonic()
+        self._certs = certs
+        self._fetched_at = now
+        self._expires_at = now + cache_ttl(response.headers)
+        self.fetches += 1
+
+    def _refresh_or_keep(self):
+        """Refresh, falling back to the certificates already held when the fetch fails"""
+        try:
+            self._refresh()
+        except Exception as e:
+            self.failures += 1
+            if not self._certs:
+                raise
+            logger.warning(f"Google certificate refresh failed, using cached certificates: {e}")
+
+    def get(self, key_id):
+        """
+        Certificate for key_id, refreshing the cache when it is stale or lacks the key
+
+        Raises:
+            ValueError if Google has no certificate for key_id
+        """
+        if self._fresh() and key_id in self._certs:
+            return self._certs[key_id]
+        with self._lock:
+            # Another thread may have refreshed while this one waited
+            if not self._fresh():
+                self._refresh_or_keep()
+            elif key_id not in self._certs and (
+                self._fetched_at is None or time.monotonic() - self._fetched_at >= GOOGLE_CERTS_MIN_REFRESH_SECONDS
+            ):
+                self._refresh_or_keep()
+            cert = self._certs.get(key_id)
+        if cert is None:
+            raise ValueError(f"Token signed with unknown key ID {key_id}")
+        return cert
+
+    def warm(self):
+        """Fetch the certificates ahead of the first login - never raises"""
+        try:
+            with self._lock:
+                if not self._fresh():
+                    self._refresh()
+            return True
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Could not prefetch Google certificates: {e}")
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._certs = {}
+            self._expires_at = 0.0
+            self._fetched_at = None
+
+    def close(self):
+        """Close the shared session"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def stats(self):
+        return {
+            "key_ids": sorted(self._certs),
+            "fresh_for_seconds": round(max(self._expires_at - time.monotonic(), 0), 1),
+            "fetches": self.fetches,
+            "failures": self.failures,
+        }
+
+certificates = CertificateCache()
+
+def _key_id(token):
+    """kid from the token header, without verifying anything"""
+    try:
+        header = token.split(".", 1)[0]
+        header = json.loads(base64.urlsafe_b64decode(header + "=" * (-len(header) % 4)))
+    except Exception:
+        raise ValueError("Malformed ID token")
+    if not isinstance(header, dict):
+        raise ValueError("Malformed ID token")
+    return header.get("kid")
+
+def verify(token, audience, certs=certificates):
+    """
+    Verify a Google ID token the way id_token.verify_oauth2_token does
+
+    Args:
+        token: The encoded ID token
+        audience: OAuth client ID the token must be issued for
+        certs: CertificateCache to take the signing certificate from
+
+    Returns:
+        dict: The token's claims
+
+    Raises:
+        ValueError if the token is malformed, expired, for another audience or
+        not issued by Google
+    """
+    cache_key = hashlib.sha256(f"{audience}\0{token}".encode("utf-8")).hexdigest()
+    claims = token_cache.get(cache_key)
+    if claims is not None:
+        return claims
+
+    from google.auth import jwt
+
+    key_id = _key_id(token)
+    if key_id is None:
+        raise ValueError("ID token has no key ID")
+    claims = jwt.decode(
+        token,
+        certs={key_id: certs.get(key_id)},
+        audience=audience,
+        clock_skew_in_seconds=GOOGLE_CLOCK_SKEW_SECONDS,
+    )
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer. 'iss' should be one of {list(GOOGLE_ISSUERS)} but is {claims.get('iss')}")
+
+    remaining = claims.get("exp", 0) - time.time()
+    if remaining > 0:
+        token_cache.set(cache_key, claims, ttl=min(remaining, ID_TOKEN_CACHE_TTL_SECONDS))
+    return claims
+
+def close():
+    certificates.close()
+
+def _collect_metrics():
+    cache = token_cache.stats()
+    return [
+        ("google_certs_fetches_total", "counter", "Google signing certificate downloads by outcome",
+         [({"outcome": "ok"}, certificates.fetches), ({"outcome": "failed"}, certificates.failures)]),
+        ("google_id_token_cache_total", "counter", "Verified ID token cache lookups",
+         [({"outcome": "hit"}, cache["hits"]), ({"outcome": "miss"}, cache["misses"])]),
+    ]
+
+metrics.add_collector(_collect_metrics)
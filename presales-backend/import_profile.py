@@ -0,0 +1,112 @@
+"""
+Import-time profile of the API
+Runs `python -X importtime -c "import main"` in a fresh interpreter and
+reports where cold-start import time goes, so regressions show up before
+they reach Cloud Run.
+
+Usage:
+    python import_profile.py                           # top 25 modules by cumulative time
+    python import_profile.py --output imports.json     # save a report
+    python import_profile.py --baseline imports.json   # exit 1 if import main got slower
+
+Each run is repeated --runs times and the fastest is kept, which filters out
+disk cache and scheduler noise.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+def profile_once(module="main", env=None):
+    """
+    {module name: (self us, cumulative us, depth)} from one fresh interpreter
+    depth is 1 for direct imports of module, 0 for module itself and for modules
+    the interpreter loaded on its own (site, encodings) - those are left out
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, **(env or {})},
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    # Children are printed before their parent, so collect entries until the
+    # top-level line they belong to and keep only the profiled module's subtree
+    modules, pending = {}, {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        depth = (len(indent) - 1) // 2
+        pending[name] = (int(self_us), int(cumulative_us), depth)
+        if depth == 0:
+            if name == module:
+                modules.update(pending)
+            pending = {}
+    return modules
+
+def profile(module="main", runs=3, top=25):
+    """Fastest of runs profiles as a report dict (times in milliseconds)"""
+    best = min((profile_once(module) for _ in range(runs)), key=lambda modules: modules[module][1])
+    ranked = sorted(best.items(), key=lambda item: item[1][1], reverse=True)
+    return {
+        "module": module,
+        "python": sys.version.split()[0],
+        "total_ms": round(best[module][1] / 1000, 1),
+        "module_count": len(best),
+        # Direct imports of the profiled module - the ones worth deferring
+        "top_level": {
+            name: round(cumulative / 1000, 1)
+            for name, (_, cumulative, depth) in ranked if depth == 1
+        },
+        "slowest": [
+            {"module": name, "cumulative_ms": round(cumulative / 1000, 1), "self_ms": round(self_us / 1000, 1)}
+            for name, (self_us, cumulative, _) in ranked[:top]
+        ],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time profile of the Flux API")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Compare total import time against this earlier report")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    report = profile(args.module, args.runs, args.top)
+    print(f" import {report['module']}: {report['total_ms']} ms across {report['module_count']} modules")
+    print(" Top-level imports:")
+    for name, ms in list(report["top_level"].items())[:15]:
+        print(f"   {ms:>8.1f} ms  {name}")
+    print(" Slowest modules (cumulative):")
+    for entry in report["slowest"]:
+        print(f"   {entry['cumulative_ms']:>8.1f} ms  {entry['module']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        change = (report["total_ms"] - baseline["total_ms"]) / baseline["total_ms"]
+        print(f" Baseline {baseline['total_ms']} ms -> {report['total_ms']} ms ({change:+.1%})")
+        new_modules = sorted(set(report["top_level"]) - set(baseline.get("top_level", {})))
+        if new_modules:
+            print(f" New top-level imports: {', '.join(new_modules)}")
+        if change > args.tolerance:
+            print(" REGRESSED")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Opportunity Import Module
+Bulk-loads a CSV into presales_tracking:
+
+1. Each row is validated against schemas.OpportunityCreate while streaming
+2. Valid rows are written to a temp staging table with COPY FROM STDIN
+3. One statement merges staging into presales_tracking keyed on
+   (account_name, opportunity): matching rows are updated, the rest inserted
+   (the last row wins when the file repeats a key)
+
+Usage:
+    python importer.py historical.csv [--dry-run]
+"""
+
+import csv
+import io
+import sys
+import json
+import tempfile
+from pydantic import ValidationError
+from database import get_db
+from crud import INSERT_COLUMNS, record_changes
+from schemas import OpportunityCreate
+import analytics
+
+COPY_NULL = '\\N'
+MAX_REPORTED_REJECTIONS = 1000
+
+def _clean(raw_row):
+    """Strip whitespace and turn empty cells into None; unknown columns are dropped"""
+    cleaned = {}
+    for key, value in raw_row.items():
+        if key is None:
+            continue
+        key = key.strip()
+        if key not in INSERT_COLUMNS:
+            continue
+        value = value.strip() if isinstance(value, str) else value
+        cleaned[key] = value if value not in ('', None) else None
+    return cleaned
+
+def _copy_value(value):
+    if value is None:
+        return COPY_NULL
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def _stage_rows(text_stream, spool):
+    """
+    Validate CSV rows and write the valid ones to spool as COPY-ready CSV
+
+    Returns:
+        (received, valid, rejected) - rejected is a list of {'line', 'errors'}
+    """
+    reader = csv.DictReader(text_stream)
+    if not reader.fieldnames or 'account_name' not in [f.strip() for f in reader.fieldnames]:
+        raise ValueError("CSV must have a header row including account_name")
+
+    writer = csv.writer(spool)
+    received = valid = 0
+    rejected = []
+    for raw_row in reader:
+        received += 1
+        line = reader.line_num
+        try:
+            record = OpportunityCreate.model_validate(_clean(raw_row)).model_dump()
+        except ValidationError as e:
+            if len(rejected) < MAX_REPORTED_REJECTIONS:
+                rejected.append({
+                    'line': line,
+                    'errors': [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()],
+                })
+            continue
+        if record.get('staffing_completed_flag') is None:
+            record['staffing_completed_flag'] = False
+        writer.writerow([line] + [_copy_value(record.get(column)) for column in INSERT_COLUMNS])
+        valid += 1
+    return received, valid, rejected
+
+def import_csv(text_stream, dry_run=False):
+    """
+    Import opportunities from a CSV text stream
+
+    Args:
+        text_stream: File-like object yielding CSV text with a header row
+        dry_run: Validate and stage, then roll back instead of merging
+
+    Returns:
+        dict report with received, valid, rejected_count, rejected, inserted, updated
+    """
+    columns = ', '.join(INSERT_COLUMNS)
+    # Spill to disk past 16 MB so a huge upload does not sit in memory
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024, mode='w+', newline='', encoding='utf-8') as spool:
+        received, valid, rejected = _stage_rows(text_stream, spool)
+        spool.seek(0)
+
+        report = {
+            'received': received,
+            'valid': valid,
+            'rejected_count': received - valid,
+            'rejected': rejected,
+            'inserted': 0,
+            'updated': 0,
+            'dry_run': dry_run,
+        }
+        if not valid:
+            return report
+
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                CREATE TEMP TABLE presales_import_staging ON COMMIT DROP AS
+                SELECT 0::bigint AS line_no, {columns}
+                FROM presales_tracking WITH NO DATA;
+            """)
+            cursor.execute(
+                f"COPY presales_import_staging (line_no, {columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                # Chunked iterable - pg8000 encodes str chunks itself
+                stream=iter(lambda: spool.read(64 * 1024), ''),
+            )
+
+            # Keep concurrent writers out so the update/insert split cannot race
+            cursor.execute("LOCK TABLE presales_tracking IN SHARE ROW EXCLUSIVE MODE")
+            assignments = ', '.join(f"{c} = src.{c}" for c in INSERT_COLUMNS if c not in ('account_name', 'opportunity'))
+            assignments += ", updated_at = now()"
+            cursor.execute(f"""
+                WITH src AS (
+                    SELECT DISTINCT ON (account_name, coalesce(opportunity, '')) *
+                    FROM presales_import_staging
+                    ORDER BY account_name, coalesce(opportunity, ''), line_no DESC
+                ),
+                updated AS (
+                    UPDATE presales_tracking AS t
+                    SET {assignments}
+                    FROM src
+                    WHERE t.account_name = src.account_name
+                      AND t.opportunity IS NOT DISTINCT FROM src.opportunity
+                    RETURNING t.id, src.line_no
+                ),
+                inserted AS (
+                    INSERT INTO presales_tracking ({columns})
+                    SELECT {columns} FROM src
+                    WHERE src.line_no NOT IN (SELECT line_no FROM updated)
+                    RETURNING id
+                )
+                SELECT id, line_no, 'update' FROM updated
+                UNION ALL
+                SELECT id, NULL, 'insert' FROM inserted;
+            """)
+            changes = cursor.fetchall()
+            report['updated'] = len({line_no for _, line_no, op in changes if op == 'update'})
+            report['inserted'] = sum(1 for _, _, op in changes if op == 'insert')
+
+            if dry_run:
+                conn.rollback()
+                return report
+
+            # A bulk load moves many buckets at once - recompute rather than apply row deltas
+            analytics.rebuild_rollups_with_cursor(cursor)
+            if changes:
+                record_changes(cursor, [(record_id, op) for record_id, _, op in changes])
+            conn.commit()
+            return report
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+def import_csv_file(path, dry_run=False):
+    """Import from a CSV file on disk"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return import_csv(f, dry_run=dry_run)
+
+def import_csv_upload(binary_stream, dry_run=False):
+    """Import from a binary upload stream (e.g. FastAPI UploadFile.file)"""
+    text_stream = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    try:
+        return import_csv(text_stream, dry_run=dry_run)
+    finally:
+        text_stream.detach()
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    dry_run = '--dry-run' in args
+    paths = [a for a in args if a != '--dry-run']
+    if len(paths) != 1:
+        print("Usage: python importer.py <file.csv> [--dry-run]")
+        sys.exit(1)
+    print(json.dumps(import_csv_file(paths[0], dry_run=dry_run), indent=2))
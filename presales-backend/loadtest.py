@@ -0,0 +1,148 @@
+"""
+Concurrent load test for the Flux API
+Fires requests at a running server from many threads and reports throughput
+and latency percentiles, so BLOCKING_IO_MODE settings can be compared.
+
+Usage:
+    # Terminal 1 - old behaviour
+    BLOCKING_IO_MODE=inline uvicorn main:app --port 8000
+    # Terminal 2
+    python loadtest.py --url http://127.0.0.1:8000 --token $FLUX_TOKEN \\
+        --path /opportunities/ --path /auth/verify --concurrency 32 --requests 2000
+
+    # Restart the server with BLOCKING_IO_MODE=threadpool and run again;
+    # p99 should drop because one slow DB/SMTP call no longer stalls the loop.
+
+Without a database, simulated_app serves main.app with every user lookup
+replaced by a LOADTEST_DB_DELAY_MS sleep (default 50), so /auth/verify costs
+one blocking DB call per request:
+
+    BLOCKING_IO_MODE=inline LOADTEST_DB_DELAY_MS=50 MIGRATIONS_ON_STARTUP=off \
+        uvicorn --factory loadtest:simulated_app --port 8000 --no-access-log
+    python loadtest.py --token "$(python loadtest.py --print-token)" \
+        --path /auth/verify --concurrency 16 --requests 200
+    # ... and again with BLOCKING_IO_MODE=threadpool
+"""
+
+import os
+import argparse
+import json
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+def summarize(latencies, errors, elapsed):
+    """Build the result dict for one run (latencies in seconds)"""
+    ordered = sorted(latencies)
+    to_ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "mean_ms": to_ms(statistics.fmean(ordered)) if ordered else None,
+        "p50_ms": to_ms(percentile(ordered, 50)),
+        "p95_ms": to_ms(percentile(ordered, 95)),
+        "p99_ms": to_ms(percentile(ordered, 99)),
+        "max_ms": to_ms(ordered[-1]) if ordered else None,
+    }
+
+def make_request(url, token=None, method="GET", body=None, timeout=30):
+    """Perform one HTTP request; returns (latency seconds, ok)"""
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, headers=headers, method=method)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = response.status < 400
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+def run_load(call, total_requests, concurrency):
+    """
+    Run call() total_requests times across concurrency threads
+    call must return (latency seconds, ok)
+    """
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, ok in pool.map(lambda _: call(), range(total_requests)):
+            if ok:
+                latencies.append(latency)
+            else:
+                errors += 1
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+SIMULATED_USER = {'id': '1', 'email': 'loadtest@google.com', 'name': 'Load Test', 'role': 'presales_admin',
+                  'invite_status': 'approved'}
+
+def simulated_app():
+    """main.app with user lookups replaced by a fixed sleep (uvicorn --factory loadtest:simulated_app)"""
+    import auth
+    import main as api
+
+    delay = float(os.getenv("LOADTEST_DB_DELAY_MS", "50")) / 1000
+
+    def lookup(email):
+        time.sleep(delay)
+        return dict(SIMULATED_USER)
+
+    auth.get_user_by_email = lookup
+    auth.get_cached_user_by_email = lookup
+    api.warm_pool = lambda: True
+    return api.app
+
+def simulated_token():
+    """JWT for SIMULATED_USER, signed with the JWT_SECRET simulated_app will use"""
+    import main as api
+    return api.create_jwt_token(SIMULATED_USER['email'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for the Flux API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the running API")
+    parser.add_argument("--token", help="Flux JWT for authenticated endpoints")
+    parser.add_argument("--path", action="append", help="Path to request (repeatable, round-robin)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--print-token", action="store_true", help="Print a token accepted by simulated_app and exit")
+    args = parser.parse_args(argv)
+
+    if args.print_token:
+        print(simulated_token())
+        return 0
+
+    paths = args.path or ["/health"]
+    counter = iter(range(sys.maxsize))
+
+    def call():
+        path = paths[next(counter) % len(paths)]
+        return make_request(args.url.rstrip("/") + path, token=args.token)
+
+    result = run_load(call, args.requests, args.concurrency)
+    result.update({"url": args.url, "paths": paths, "concurrency": args.concurrency})
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,21 +4,34 @@ FastAPI server with Google SSO, RBAC, JWT Sessions, and Email Invite Flow
 FIXED VERSION - Properly handles NULL values from frontend
 """
 
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Response, Depends, Query, Header, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, Union
+from pydantic import BaseModel, EmailStr, Field, ValidationError, validator
+from typing import Any, Dict, List, Literal, Optional, Union
 from datetime import date, datetime, timedelta
 import crud
+import conditional
+import serializers
+from compression import CompressionMiddleware
+import metrics
+from schemas import OpportunityCreate, OpportunityUpdate
+import analytics
+import export
+import importer
+import changefeed
+import migrations
 import auth as auth
-from database import test_connection, close_connector
-from google.oauth2 import id_token
-from google.auth.transport import requests
+import id_tokens
+from database import test_connection, warm_pool, close_connector, get_db_stats
+from workers import run_db, run_blocking, shutdown_executors, BLOCKING_IO_MODE
+import email_outbox
+from email_service import EMAIL_DELIVERY_MODE
 import os
+import asyncio
 import logging
-import jwt
+import importlib
 
 # Configure logging for Cloud Run
 logging.basicConfig(
@@ -39,6 +52,22 @@ ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
+# "email" - token carries only the email, every request loads the user
+# "claims" - token carries id/name/role/token_version, requests only check the (cached) version
+JWT_TOKEN_FORMAT = os.getenv("JWT_TOKEN_FORMAT", "email").lower()
+
+# Cold start: serve as soon as the schema is migrated; the pool warms, the schema check
+# (MIGRATIONS_ON_STARTUP=check) runs and the modules only needed for login / email
+# (DEFERRED_IMPORTS) load in the background. false restores the blocking connection test.
+FAST_START = os.getenv("FAST_START", "true").lower() == "true"
+DEFERRED_IMPORTS = (
+    "jwt",
+    "google.auth.jwt",
+    "requests",
+    "smtplib",
+    "email.mime.multipart",
+    "email.mime.text",
+)
 
 if not GOOGLE_CLIENT_ID:
     logger.warning("GOOGLE_CLIENT_ID not configured")
@@ -49,18 +78,25 @@ ALLOWED_ORIGINS = [
     "http://localhost:3000"
 ]
 
+# Inside CORS so preflight responses are never touched
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
     expose_headers=["*"],
     max_age=3600,
 )
 
+# Outermost, so latency and response size include CORS and compression
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 class GoogleAuthRequest(BaseModel):
     """Google SSO token request"""
@@ -77,81 +113,54 @@ class UserRoleUpdate(BaseModel):
     user_id: str
     role: str
 
-class OpportunityCreate(BaseModel):
+class OpportunityBulkRequest(BaseModel):
     """
-    Opportunity creation model
-    FIXED: All fields except account_name are Optional and can be None
-    charging_on_vector is now a string (not bool) to match UI options like "Yes", "No", "Not Yet"
+    Bulk create/update request
+    Items are validated one by one so a bad row is reported instead of rejecting the batch
+    atomic: all rows or none; best_effort: every valid row that can be written is written
     """
-    account_name: str  # Only required field
-    opportunity: Optional[str] = None
-    region_location: Optional[str] = None
-    region: Optional[str] = None
-    sub_region: Optional[str] = None
-    deal_value_usd: Optional[float] = None
-    scoping_doc: Optional[str] = None
-    vector_link: Optional[str] = None
-    charging_on_vector: Optional[str] = None  # FIXED: Changed from bool to Optional[str]
-    period_of_presales_weeks: Optional[int] = None
-    status: Optional[str] = None
-    assignee_from_gsd: Optional[str] = None
-    pursuit_lead: Optional[str] = None
-    delivery_manager: Optional[str] = None
-    presales_start_date: Optional[date] = None
-    expected_planned_start: Optional[date] = None
-    sow_signature_date: Optional[date] = None
-    staffing_completed_flag: Optional[bool] = False  # FIXED: Made optional with default False
-    staffing_poc: Optional[str] = None
-    remarks: Optional[str] = None
-    
-    class Config:
-        # Allow None values to be passed explicitly
-        use_enum_values = True
-        validate_assignment = True
+    mode: Literal['atomic', 'best_effort'] = 'atomic'
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=crud.BULK_MAX_ITEMS)
 
-class OpportunityUpdate(BaseModel):
-    """
-    Opportunity update model
-    FIXED: All fields are Optional to allow partial updates
-    """
-    account_name: Optional[str] = None
-    opportunity: Optional[str] = None
-    region_location: Optional[str] = None
-    region: Optional[str] = None
-    sub_region: Optional[str] = None
-    deal_value_usd: Optional[float] = None
-    scoping_doc: Optional[str] = None
-    vector_link: Optional[str] = None
-    charging_on_vector: Optional[str] = None  # FIXED: Changed from Optional[bool] to Optional[str]
-    period_of_presales_weeks: Optional[int] = None
-    status: Optional[str] = None
-    assignee_from_gsd: Optional[str] = None
-    pursuit_lead: Optional[str] = None
-    delivery_manager: Optional[str] = None
-    presales_start_date: Optional[date] = None
-    expected_planned_start: Optional[date] = None
-    sow_signature_date: Optional[date] = None
-    staffing_completed_flag: Optional[bool] = None
-    staffing_poc: Optional[str] = None
-    remarks: Optional[str] = None
-    
-    class Config:
-        use_enum_values = True
-        validate_assignment = True
+class OpportunityBulkDelete(BaseModel):
+    """Bulk delete request"""
+    mode: Literal['atomic', 'best_effort'] = 'atomic'
+    ids: List[int] = Field(..., min_length=1, max_length=crud.BULK_MAX_ITEMS)
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
 
-def create_jwt_token(user_email: str) -> str:
-    """Create JWT token for user session"""
+def _bulk_response(mode: str, results: list, success_status: str) -> dict:
+    succeeded = sum(1 for r in results if r['status'] == success_status)
+    return {
+        "mode": mode,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": [{"index": i, **r} for i, r in enumerate(results)]
+    }
+
+def create_jwt_token(user_email: str, user: Optional[dict] = None) -> str:
+    """Create JWT token for user session (with role claims when JWT_TOKEN_FORMAT=claims)"""
     expiration = datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
     payload = {
         "email": user_email,
         "exp": expiration,
         "iat": datetime.utcnow()
     }
+    if JWT_TOKEN_FORMAT == "claims" and user and user.get('token_version') is not None:
+        payload.update({
+            "sub": str(user['id']),
+            "name": user['name'],
+            "role": user['role'],
+            "ver": user['token_version'],
+        })
+    import jwt
     token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return token
 
 def verify_jwt_token(token: str) -> dict:
     """Verify JWT token and return payload"""
+    import jwt
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         return payload
@@ -160,7 +169,7 @@ def verify_jwt_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Extract and validate user from JWT token"""
     try:
         # Verify JWT token
@@ -171,8 +180,25 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             logger.warning("Token missing email")
             raise HTTPException(status_code=401, detail="Invalid token payload")
         
+        # Claims-based token: authorize from the claims after a cached revocation check
+        if "ver" in payload and "sub" in payload:
+            user_id = payload["sub"]
+            version = auth.peek_token_version(user_id)
+            if version is None:
+                version = await run_db(auth.get_cached_token_version, user_id)
+            if version != payload["ver"]:
+                logger.warning(f"Revoked token for: {user_email}")
+                raise HTTPException(status_code=401, detail="Token has been revoked")
+            return {
+                'id': user_id,
+                'email': user_email,
+                'name': payload.get('name'),
+                'role': payload.get('role'),
+                'invite_status': 'approved'
+            }
+        
         # Get user from database
-        user = auth.get_user_by_email(user_email)
+        user = await run_db(auth.get_cached_user_by_email, user_email)
         
         if not user:
             logger.warning(f"User not found: {user_email}")
@@ -187,6 +213,50 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         logger.error(f"Authentication error: {str(e)}")
         raise HTTPException(status_code=401, detail=f"Authentication error: {str(e)}")
 
+async def get_stream_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    ticket: Optional[str] = Query(None, description="Single-use ticket from POST /opportunities/stream/ticket (EventSource)")
+) -> dict:
+    """get_current_user that also accepts a stream ticket, so the JWT never goes in a URL"""
+    if credentials is not None:
+        return await get_current_user(credentials)
+    if not ticket:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    email = await run_db(auth.redeem_stream_ticket, ticket)
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid or expired stream ticket")
+    user = await run_db(auth.get_cached_user_by_email, email)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+def get_opportunity_filters(
+    status: Optional[List[str]] = Query(None),
+    region: Optional[List[str]] = Query(None),
+    sub_region: Optional[List[str]] = Query(None),
+    presales_start_from: Optional[date] = None,
+    presales_start_to: Optional[date] = None,
+    sow_signature_from: Optional[date] = None,
+    sow_signature_to: Optional[date] = None,
+    min_deal_value: Optional[float] = None,
+    max_deal_value: Optional[float] = None,
+    q: Optional[str] = Query(None, max_length=200, description="Free-text search")
+) -> dict:
+    """Opportunity list filters shared by the list and reporting endpoints"""
+    return {
+        'status': status,
+        'region': region,
+        'sub_region': sub_region,
+        'presales_start_from': presales_start_from,
+        'presales_start_to': presales_start_to,
+        'sow_signature_from': sow_signature_from,
+        'sow_signature_to': sow_signature_to,
+        'min_deal_value': min_deal_value,
+        'max_deal_value': max_deal_value,
+        'q': q,
+    }
+
 def check_permission(user: dict, required_permissions: list):
     """Check if user has required permissions based on role"""
     role_permissions = {
@@ -205,19 +275,60 @@ def check_permission(user: dict, required_permissions: list):
                 detail=f"Access denied. '{user['role']}' role cannot '{permission}'."
             )
 
+_background_tasks = set()
+
 @app.on_event("startup")
 async def startup():
     """Application startup"""
     logger.info("Starting Flux API")
     logger.info(f"Environment: Cloud Run")
     logger.info(f"CORS enabled for: {ALLOWED_ORIGINS}")
-    test_connection()
+    logger.info(f"Blocking I/O mode: {BLOCKING_IO_MODE}")
+    if FAST_START:
+        # Load the deferred modules on a thread while the migrations run
+        preload = asyncio.create_task(asyncio.to_thread(_preload_modules))
+        if migrations.MIGRATIONS_ON_STARTUP == "apply":
+            # Requests must never see the old schema - a failure here stops the startup
+            await run_db(migrations.startup_check, raise_errors=True)
+        _background_tasks.add(asyncio.create_task(_warm_up(preload)))
+    else:
+        await run_db(test_connection)
+        await run_db(migrations.startup_check, raise_errors=True)
+    if EMAIL_DELIVERY_MODE == "outbox":
+        email_outbox.start_worker()
+
+def _preload_modules():
+    for name in DEFERRED_IMPORTS:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {e}")
+
+async def _warm_up(preload):
+    """Fast-start background work - runs while the first requests are already being served"""
+    try:
+        await run_db(warm_pool)
+        if migrations.MIGRATIONS_ON_STARTUP == "check":
+            await run_db(migrations.startup_check)
+        await preload
+        if GOOGLE_CLIENT_ID:
+            await run_blocking(id_tokens.certificates.warm)
+    except Exception as e:
+        logger.error(f"Background warm-up failed: {e}")
+    finally:
+        _background_tasks.discard(asyncio.current_task())
 
 @app.on_event("shutdown")
 async def shutdown():
     """Application shutdown"""
     logger.info("Shutting down Flux API")
+    for task in list(_background_tasks):
+        task.cancel()
+    changefeed.hub.stop()
+    email_outbox.stop_worker()
+    shutdown_executors()
     close_connector()
+    id_tokens.close()
 
 @app.get("/")
 async def root():
@@ -235,6 +346,31 @@ async def health_check():
     """Health check endpoint for Cloud Run"""
     return {"status": "healthy", "service": "flux-api"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(authorization: Optional[str] = Header(None)):
+    """Prometheus scrape endpoint - needs Authorization: Bearer <METRICS_TOKEN> when one is set"""
+    if metrics.METRICS_TOKEN and authorization != f"Bearer {metrics.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/admin/db-stats")
+async def db_stats(user: dict = Depends(get_current_user)):
+    """Connection pool usage and prepared statement reuse (admin only)"""
+    check_permission(user, ['manage_users'])
+    return get_db_stats()
+
+@app.get("/admin/schema")
+async def schema_report(user: dict = Depends(get_current_user)):
+    """Migration status and index health (admin only)"""
+    check_permission(user, ['manage_users'])
+    try:
+        migration_status = await run_db(migrations.get_status)
+        indexes = await run_db(migrations.index_report)
+        return {"migrations": migration_status, "indexes": indexes}
+    except Exception as e:
+        logger.error(f"Failed to build schema report: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ============ AUTH ENDPOINTS ============
 
 @app.post("/auth/google")
@@ -243,11 +379,8 @@ async def google_auth(auth_request: GoogleAuthRequest):
     try:
         logger.info("Attempting Google authentication")
         
-        idinfo = id_token.verify_oauth2_token(
-            auth_request.token, 
-            requests.Request(), 
-            GOOGLE_CLIENT_ID
-        )
+        # Cached certificates, verified on a worker thread (id_tokens.py)
+        idinfo = await run_blocking(id_tokens.verify, auth_request.token, GOOGLE_CLIENT_ID)
         email = idinfo['email']
         name = idinfo.get('name', email.split('@')[0])
         
@@ -260,10 +393,11 @@ async def google_auth(auth_request: GoogleAuthRequest):
                 detail="Only @google.com accounts are allowed. Please contact admin for access."
             )
         
-        user = auth.create_or_update_user(email, name)
+        user = await run_db(auth.create_or_update_user, email, name)
         
         # Create JWT token for session
-        jwt_token = create_jwt_token(email)
+        jwt_token = create_jwt_token(email, user)
+        user.pop('token_version', None)
         
         logger.info(f"Successful login: {email}")
         
@@ -293,7 +427,7 @@ async def verify_token(user: dict = Depends(get_current_user)):
 async def approve_invite(token: str):
     """Approve user invitation"""
     try:
-        result = auth.approve_invite(token, ADMIN_EMAIL)
+        result = await run_db(auth.approve_invite, token, ADMIN_EMAIL)
         logger.info(f"Invite approved: {result['email']}")
         return {
             "message": "Invitation approved successfully! You can now sign in to Flux.",
@@ -311,7 +445,7 @@ async def approve_invite(token: str):
 async def reject_invite(token: str):
     """Reject user invitation"""
     try:
-        result = auth.reject_invite(token, ADMIN_EMAIL)
+        result = await run_db(auth.reject_invite, token, ADMIN_EMAIL)
         logger.info(f"Invite rejected: {result['email']}")
         return {
             "message": "Invitation declined. The administrator has been notified.",
@@ -332,7 +466,7 @@ async def get_all_users_endpoint(user: dict = Depends(get_current_user)):
     """Get all users (admin only)"""
     check_permission(user, ['manage_users'])
     try:
-        users = auth.get_all_users()
+        users = await run_db(auth.get_all_users)
         return {"data": users}
     except Exception as e:
         logger.error(f"Failed to get users: {str(e)}")
@@ -349,7 +483,8 @@ async def add_user_endpoint(user_data: UserCreate, admin_user: dict = Depends(ge
                 detail="Only @google.com email addresses are allowed"
             )
         
-        new_user = auth.add_user(
+        new_user = await run_db(
+            auth.add_user,
             user_data.email, 
             user_data.name, 
             user_data.role,
@@ -375,7 +510,8 @@ async def update_user_role_endpoint(role_update: UserRoleUpdate, admin_user: dic
     check_permission(admin_user, ['manage_users'])
     
     try:
-        updated_user = auth.update_user_role(
+        updated_user = await run_db(
+            auth.update_user_role,
             role_update.user_id, 
             role_update.role,
             admin_user['name']
@@ -394,7 +530,7 @@ async def delete_user_endpoint(user_id: str, admin_user: dict = Depends(get_curr
     """Delete user (admin only)"""
     check_permission(admin_user, ['manage_users'])
     try:
-        deleted_user = auth.delete_user(user_id, admin_user['name'])
+        deleted_user = await run_db(auth.delete_user, user_id, admin_user['name'])
         logger.info(f"User deleted by {admin_user['email']}: {deleted_user['email']}")
         return {"message": "User deleted successfully", "user": deleted_user}
     except ValueError as e:
@@ -418,7 +554,7 @@ async def create_opportunity(opportunity: OpportunityCreate, user: dict = Depend
         # Log the incoming data for debugging
         logger.info(f"Creating opportunity with data: {data}")
         
-        result = crud.create_record(data)
+        result = await run_db(crud.create_record, data)
         logger.info(f"Opportunity created by {user['email']}: {result['id']}")
         return {"message": "Created successfully", "data": result}
     except Exception as e:
@@ -426,27 +562,304 @@ async def create_opportunity(opportunity: OpportunityCreate, user: dict = Depend
         logger.error(f"Data received: {opportunity.model_dump()}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/opportunities/bulk")
+async def bulk_create_opportunities(request: OpportunityBulkRequest, user: dict = Depends(get_current_user)):
+    """Create many opportunities in one transaction with per-row results"""
+    check_permission(user, ['create'])
+    
+    results = [None] * len(request.items)
+    valid = []
+    for index, item in enumerate(request.items):
+        try:
+            valid.append((index, OpportunityCreate.model_validate(item).model_dump()))
+        except ValidationError as e:
+            results[index] = {"status": "error", "error": _validation_message(e)}
+    
+    atomic = request.mode == 'atomic'
+    if atomic and len(valid) < len(results):
+        raise HTTPException(status_code=400, detail=_bulk_response(request.mode, [
+            r or {"status": "error", "error": "Not written - batch rejected"} for r in results
+        ], 'created'))
+    
+    try:
+        written = await run_db(crud.bulk_create_records, [data for _, data in valid], atomic)
+    except Exception as e:
+        logger.error(f"Bulk create failed: {str(e)}")
+        raise HTTPException(status_code=400 if atomic else 500, detail=str(e))
+    
+    for (index, _), result in zip(valid, written):
+        results[index] = result
+    response = _bulk_response(request.mode, results, 'created')
+    logger.info(f"Bulk create by {user['email']}: {response['succeeded']} created, {response['failed']} failed")
+    return response
+
+@app.patch("/opportunities/bulk")
+async def bulk_update_opportunities(request: OpportunityBulkRequest, user: dict = Depends(get_current_user)):
+    """Update many opportunities in one transaction; each item needs an id plus the fields to change"""
+    check_permission(user, ['edit'])
+    
+    results = [None] * len(request.items)
+    valid = []
+    for index, item in enumerate(request.items):
+        fields = {k: v for k, v in item.items() if k != 'id'}
+        try:
+            record_id = int(item['id'])
+            update = OpportunityUpdate.model_validate(fields)
+            data = {k: v for k, v in update.model_dump().items() if k in update.model_fields_set}
+            valid.append((index, {'id': record_id, 'data': data}))
+        except (KeyError, TypeError, ValueError) as e:
+            message = _validation_message(e) if isinstance(e, ValidationError) else "id: a valid integer id is required"
+            results[index] = {"status": "error", "error": message}
+    
+    atomic = request.mode == 'atomic'
+    if atomic and len(valid) < len(results):
+        raise HTTPException(status_code=400, detail=_bulk_response(request.mode, [
+            r or {"status": "error", "error": "Not written - batch rejected"} for r in results
+        ], 'updated'))
+    
+    try:
+        written = await run_db(crud.bulk_update_records, [item for _, item in valid], atomic)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Bulk update failed: {str(e)}")
+        raise HTTPException(status_code=400 if atomic else 500, detail=str(e))
+    
+    for (index, _), result in zip(valid, written):
+        results[index] = result
+    response = _bulk_response(request.mode, results, 'updated')
+    logger.info(f"Bulk update by {user['email']}: {response['succeeded']} updated, {response['failed']} failed")
+    return response
+
+@app.delete("/opportunities/bulk")
+async def bulk_delete_opportunities(request: OpportunityBulkDelete, user: dict = Depends(get_current_user)):
+    """Delete many opportunities in one statement with per-id results"""
+    check_permission(user, ['delete'])
+    
+    try:
+        results = await run_db(crud.bulk_delete_records, request.ids, request.mode == 'atomic')
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Bulk delete failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    response = _bulk_response(request.mode, results, 'deleted')
+    logger.info(f"Bulk delete by {user['email']}: {response['succeeded']} deleted, {response['failed']} failed")
+    return response
+
 @app.get("/opportunities/")
-async def get_all_opportunities(user: dict = Depends(get_current_user)):
-    """Get all opportunities"""
+async def get_all_opportunities(
+    request: Request,
+    response: Response,
+    limit: int = Query(crud.DEFAULT_PAGE_SIZE, ge=1, le=crud.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = 'id',
+    order: str = 'asc',
+    include_total: bool = False,
+    all_records: bool = Query(False, alias="all", description="Return every row unpaginated (legacy response)"),
+    filters: dict = Depends(get_opportunity_filters),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Get opportunities matching the filters, one page at a time using keyset cursors
+    Pass next_cursor from the previous response as cursor to get the next page
+    all=true returns the legacy unpaginated {"count", "data"} response
+    Responses carry an ETag; If-None-Match answers 304 while the data version is unchanged
+    Accept: application/json; shape=records|columnar selects the pre-rendered fast path,
+    application/msgpack and application/vnd.apache.arrow.stream the binary encodings
+    """
     check_permission(user, ['view'])
     
     try:
-        results = crud.get_all_records()
-        return {"count": len(results), "data": results}
+        shape = serializers.negotiate(request.headers.get('accept'))
+        
+        # Read the version before the rows so the ETag can never be newer than the data
+        version = await run_db(crud.get_data_version)
+        request_key = f"{shape}|{sorted(request.query_params.multi_items())}"
+        etag = conditional.collection_etag(version['version'], request_key)
+        headers = conditional.validator_headers(etag, version['updated_at'])
+        headers['Vary'] = 'Accept'
+        if conditional.not_modified(request.headers, etag, version['updated_at']):
+            return Response(status_code=304, headers=headers)
+        
+        if shape is None:
+            response.headers.update(headers)
+            if all_records:
+                results = await run_db(crud.get_all_records, filters)
+                return {"count": len(results), "data": results}
+            return await run_db(crud.get_records_page, limit, cursor, sort, order, include_total, filters)
+        
+        if all_records:
+            payload = await run_db(crud.get_all_records, filters, True)
+            payload['count'] = len(payload['rows'])
+        else:
+            payload = await run_db(crud.get_records_page, limit, cursor, sort, order, include_total, filters, True)
+        columns, types, rows = payload.pop('columns'), payload.pop('types'), payload.pop('rows')
+        return Response(
+            content=serializers.render_rows(payload, columns, rows, shape, types),
+            media_type=serializers.MEDIA_TYPES[shape],
+            headers=headers
+        )
+    except serializers.NotAcceptable as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get opportunities: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/opportunities/import")
+async def import_opportunities(
+    file: UploadFile = File(..., description="CSV with a header row of opportunity column names"),
+    dry_run: bool = False,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Bulk import opportunities from CSV via COPY into a staging table
+    Rows are upserted on (account_name, opportunity); rejected rows are listed in the report
+    """
+    check_permission(user, ['create', 'edit'])
+    
+    try:
+        report = await run_db(importer.import_csv_upload, file.file, dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Import failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    logger.info(
+        f"Import by {user['email']} ({file.filename}): {report['inserted']} inserted, "
+        f"{report['updated']} updated, {report['rejected_count']} rejected, dry_run={dry_run}"
+    )
+    return report
+
+@app.get("/opportunities/export")
+async def export_opportunities(
+    format: str = Query('csv', description="csv, ndjson, xlsx, msgpack or arrow"),
+    filters: dict = Depends(get_opportunity_filters),
+    user: dict = Depends(get_current_user)
+):
+    """Stream opportunities matching the filters as a file download"""
+    check_permission(user, ['view'])
+    
+    try:
+        stream = await export.open_export(format, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except export.ExportBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(export.EXPORT_RETRY_AFTER_SECONDS)}
+        )
+    
+    filename = f"opportunities-{date.today().isoformat()}.{format}"
+    logger.info(f"Export ({format}) started by {user['email']}")
+    return StreamingResponse(
+        stream,
+        media_type=export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/opportunities/changes")
+async def get_opportunity_changes(
+    since: int = Query(..., ge=0, description="'version' returned by the previous sync"),
+    cursor: Optional[str] = None,
+    limit: int = Query(crud.CHANGE_BATCH_SIZE, ge=1, le=crud.MAX_CHANGES_PAGE),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Delta sync - records inserted or updated since a data version, plus deleted ids
+    Follow next_cursor until it is None, then keep 'version' as the next since.
+    410 means the change log no longer covers since: reload with GET /opportunities/
+    """
+    check_permission(user, ['view'])
+    
+    try:
+        return await run_db(crud.get_changes_since, since, cursor, limit)
+    except crud.ChangesExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to get opportunity changes: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/opportunities/stream/ticket")
+async def create_stream_ticket(user: dict = Depends(get_current_user)):
+    """
+    Single-use ticket for opening /opportunities/stream?ticket=...
+    EventSource cannot send an Authorization header; request a new ticket for every (re)connect
+    """
+    check_permission(user, ['view'])
+    try:
+        ticket = await run_db(auth.issue_stream_ticket, user['email'])
+        return {"ticket": ticket, "expires_in": auth.STREAM_TICKET_TTL_SECONDS}
+    except Exception as e:
+        logger.error(f"Failed to issue stream ticket: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/opportunities/stream")
+async def stream_opportunity_changes(
+    request: Request,
+    since: Optional[str] = Query(None, description="Resume after this version or event id"),
+    last_event_id: Optional[str] = Header(None),
+    user: dict = Depends(get_stream_user)
+):
+    """
+    Server-Sent Events feed of opportunity creates, updates and deletes
+    Each 'change' event carries {version, id, op, data}; reconnects resume from Last-Event-ID
+    """
+    check_permission(user, ['view'])
+    if not changefeed.CHANGEFEED_ENABLED:
+        raise HTTPException(status_code=503, detail="Change feed is disabled")
+    
+    try:
+        position = changefeed.parse_event_id(last_event_id or since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        await run_db(changefeed.hub.start)
+    except Exception as e:
+        logger.error(f"Failed to start change feed: {str(e)}")
+        raise HTTPException(status_code=503, detail="Change feed unavailable")
+    
+    logger.info(f"Change stream opened by {user['email']}")
+    return StreamingResponse(
+        changefeed.event_stream(request, position),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/opportunities/facets")
+async def get_opportunity_facets(user: dict = Depends(get_current_user)):
+    """Distinct status / region / sub_region values for the filter dropdowns"""
+    check_permission(user, ['view'])
+    
+    try:
+        return {"data": await run_db(crud.get_filter_options)}
+    except Exception as e:
+        logger.error(f"Failed to get opportunity facets: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/opportunities/{id}")
-async def get_opportunity(id: int, user: dict = Depends(get_current_user)):
-    """Get opportunity by ID"""
+async def get_opportunity(id: int, request: Request, response: Response, user: dict = Depends(get_current_user)):
+    """Get opportunity by ID - ETag / Last-Modified validated, 304 when unchanged"""
     check_permission(user, ['view'])
     
     try:
-        result = crud.get_record_by_id(id)
+        result = await run_db(crud.get_record_by_id, id)
         if result is None:
             raise HTTPException(status_code=404, detail="Record not found")
+        
+        etag = conditional.record_etag(result)
+        headers = conditional.validator_headers(etag, result['updated_at'])
+        if conditional.not_modified(request.headers, etag, result['updated_at']):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
         return {"data": result}
     except HTTPException:
         raise
@@ -455,7 +868,13 @@ async def get_opportunity(id: int, user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/opportunities/{id}")
-async def update_opportunity(id: int, opportunity: OpportunityUpdate, user: dict = Depends(get_current_user)):
+async def update_opportunity(
+    id: int,
+    opportunity: OpportunityUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag from a previous read; 412 if the record changed since"),
+    user: dict = Depends(get_current_user)
+):
     """Update opportunity by ID - FIXED to handle null values properly"""
     check_permission(user, ['edit'])
     
@@ -473,12 +892,19 @@ async def update_opportunity(id: int, opportunity: OpportunityUpdate, user: dict
         
         logger.info(f"Updating opportunity {id} with fields: {list(provided_fields.keys())}")
         
-        result = crud.update_record(id, provided_fields)
+        precondition = None
+        if if_match:
+            precondition = lambda current: conditional.etag_matches(if_match, conditional.record_etag(current))
+        
+        result = await run_db(crud.update_record, id, provided_fields, precondition)
         if result is None:
             raise HTTPException(status_code=404, detail="Record not found")
         
         logger.info(f"Opportunity updated by {user['email']}: {id}")
+        response.headers.update(conditional.validator_headers(conditional.record_etag(result), result['updated_at']))
         return {"message": "Updated successfully", "data": result}
+    except crud.PreconditionFailed as e:
+        raise HTTPException(status_code=412, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
@@ -491,7 +917,7 @@ async def delete_opportunity(id: int, user: dict = Depends(get_current_user)):
     check_permission(user, ['delete'])
     
     try:
-        success = crud.delete_record(id)
+        success = await run_db(crud.delete_record, id)
         if not success:
             raise HTTPException(status_code=404, detail="Record not found")
         
@@ -501,4 +927,36 @@ async def delete_opportunity(id: int, user: dict = Depends(get_current_user)):
         raise
     except Exception as e:
         logger.error(f"Failed to delete opportunity: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ============ ANALYTICS ENDPOINTS ============
+
+@app.get("/analytics/summary")
+async def get_analytics_summary(
+    request: Request,
+    response: Response,
+    filters: dict = Depends(get_opportunity_filters),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Aggregated totals and monthly/region/status series for the analytics dashboard
+    Accept: application/msgpack returns the same body as MessagePack
+    """
+    check_permission(user, ['view'])
+    
+    try:
+        representation = serializers.negotiate(request.headers.get('accept'), tabular=False)
+        summary = {"data": await run_db(analytics.get_summary, filters)}
+        if representation is None:
+            response.headers["Vary"] = "Accept"
+            return summary
+        return Response(
+            content=serializers.render(summary, representation),
+            media_type=serializers.MEDIA_TYPES[representation],
+            headers={"Vary": "Accept"}
+        )
+    except serializers.NotAcceptable as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to get analytics summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,283 @@
+"""
+Metrics Module
+Request-level performance instrumentation exposed in the Prometheus text format.
+
+- MetricsMiddleware records per-route latency, in-flight requests and
+  response size for every HTTP request
+- database.py reports statement execution time, pool checkout wait and new
+  connection (connector handshake) time; email_service / email_outbox report
+  SMTP time
+- Time spent on the database during a request is accumulated per request (the
+  request's context is carried into run_db threads), observed per route and,
+  with SERVER_TIMING_ENABLED=true, returned in a Server-Timing header so the
+  browser devtools show where a slow page spent its time:
+      Server-Timing: db;dur=12.4;desc="round trips: 3", pool;dur=0.1, connect;dur=0, app;dur=31.9
+- GET /metrics serves everything; set METRICS_TOKEN to require
+  Authorization: Bearer <token> from the scraper
+
+No client library is needed - the exposition format is written directly.
+"""
+
+import os
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette appends the charset
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_registry = []
+_collectors = []
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels, value):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, labels, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = ("le", _format_value(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+        lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+def add_collector(func):
+    """
+    Register a callable producing metrics computed at scrape time
+    It returns a list of (name, kind, documentation, [(labels dict, value), ...])
+    """
+    _collectors.append(func)
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, kind, documentation, samples in collector():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+# ----- Metrics -----
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_DURATION = Histogram("http_request_duration_seconds", "Time until the response was fully sent", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served")
+HTTP_RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body bytes as sent (after compression)",
+                               ("method", "route"), buckets=SIZE_BUCKETS)
+HTTP_DB_TIME = Histogram("http_request_db_seconds", "Database time spent while serving a request", ("method", "route"))
+
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "Statement execution time including the round trip")
+DB_POOL_WAIT = Histogram("db_pool_checkout_wait_seconds", "Time to check out a pooled connection, including opening one")
+DB_CONNECT_DURATION = Histogram("db_connect_duration_seconds", "Time to open a new database connection (connector handshake)")
+
+SMTP_DURATION = Histogram("smtp_duration_seconds", "SMTP time by operation", ("operation",))
+
+# ----- Per-request timings -----
+
+class RequestTimings:
+    """Time accumulated by one request in each component, in seconds"""
+
+    __slots__ = ("_lock", "db", "queries", "pool", "connect", "smtp")
+
+    def __init__(self):
+        self._lock = threading.Lock()  # run_db calls of one request may overlap
+        self.db = 0.0
+        self.queries = 0
+        self.pool = 0.0
+        self.connect = 0.0
+        self.smtp = 0.0
+
+    def add(self, component, seconds):
+        with self._lock:
+            setattr(self, component, getattr(self, component) + seconds)
+            if component == "db":
+                self.queries += 1
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+def current_timings():
+    return _current.get()
+
+def _add(component, seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(component, seconds)
+
+def observe_query(seconds):
+    DB_QUERY_DURATION.observe(seconds)
+    _add("db", seconds)
+
+def observe_pool_wait(seconds):
+    DB_POOL_WAIT.observe(seconds)
+    _add("pool", seconds)
+
+def observe_connect(seconds):
+    DB_CONNECT_DURATION.observe(seconds)
+    _add("connect", seconds)
+
+def observe_smtp(operation, seconds):
+    SMTP_DURATION.observe(seconds, operation)
+    _add("smtp", seconds)
+
+def server_timing(timings, elapsed):
+    """Server-Timing header value (durations in milliseconds)"""
+    parts = [f'db;dur={timings.db * 1000:.1f};desc="round trips: {timings.queries}"']
+    parts.append(f"pool;dur={timings.pool * 1000:.1f}")
+    parts.append(f"connect;dur={timings.connect * 1000:.1f}")
+    if timings.smtp:
+        parts.append(f"smtp;dur={timings.smtp * 1000:.1f}")
+    parts.append(f"app;dur={elapsed * 1000:.1f}")
+    return ", ".join(parts)
+
+# ----- Middleware -----
+
+_route_paths = {}
+
+def _route_label(scope):
+    """Route template (e.g. /opportunities/{id}) - raw paths would explode label cardinality"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        app = scope.get("app")
+        for route in getattr(app, "routes", ()):
+            if getattr(route, "endpoint", None) is endpoint:
+                path = route.path
+                break
+        path = _route_paths[endpoint] = path or "unmatched"
+    return path
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency, size, in-flight count and DB time"""
+
+    def __init__(self, app, server_timing=SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = server_timing(timings, time.perf_counter() - started)
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"server-timing", header.encode("latin-1"))]}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            method, route = scope["method"], _route_label(scope)
+            HTTP_REQUESTS.inc(method, route, str(status))
+            HTTP_DURATION.observe(elapsed, method, route)
+            HTTP_RESPONSE_SIZE.observe(size, method, route)
+            HTTP_DB_TIME.observe(timings.db, method, route)
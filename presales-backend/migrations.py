@@ -0,0 +1,282 @@
+"""
+Schema Migrations Module
+Versioned DDL for every table the backend uses, applied in order from
+migrations/NNNN_<name>.sql and recorded in schema_migrations.
+
+- Each migration runs in its own transaction under an advisory lock, so
+  several instances starting at once apply it exactly once
+- Migrations are written to be idempotent (IF NOT EXISTS / ON CONFLICT), so
+  databases set up by hand before this runner existed migrate cleanly
+- Applied migrations must not be edited: migrate() refuses to run while a
+  recorded checksum differs from its file - add a new migration instead
+- On startup MIGRATIONS_ON_STARTUP=apply (default) brings the schema up to
+  date before the app serves requests, and a failure stops the startup;
+  check only logs pending migrations, off skips the step
+- index_report() lists expected indexes that are missing, indexes that have
+  never been scanned and large tables read mostly by sequential scans
+
+CLI:
+    python migrations.py status
+    python migrations.py migrate
+    python migrations.py indexes
+"""
+
+import os
+import re
+import sys
+import hashlib
+import logging
+from collections import namedtuple
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATIONS_ON_STARTUP = os.getenv("MIGRATIONS_ON_STARTUP", "apply").lower()  # apply, check or off
+INDEX_REPORT_MIN_ROWS = int(os.getenv("INDEX_REPORT_MIN_ROWS", "1000"))  # Smaller tables are fine to scan
+
+# pg_advisory_xact_lock key serializing migrations across instances
+MIGRATION_LOCK_KEY = 7_231_001
+
+_FILENAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+_INDEX_NAME = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+Migration = namedtuple("Migration", ["version", "name", "sql", "checksum"])
+
+class ChecksumMismatch(Exception):
+    """An applied migration's file was changed after it ran"""
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """
+    Migration files in version order
+
+    Raises:
+        ValueError if two files share a version number
+    """
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {filename}")
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            sql = f.read()
+        checksum = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+        migrations[version] = Migration(version, match.group(2), sql, checksum)
+    return [migrations[version] for version in sorted(migrations)]
+
+def _ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version     INTEGER PRIMARY KEY,
+            name        TEXT NOT NULL,
+            checksum    TEXT NOT NULL,
+            applied_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+def _applied(cursor):
+    """{version: (checksum, applied_at)} of the recorded migrations"""
+    cursor.execute("SELECT to_regclass('schema_migrations')")
+    if cursor.fetchone()[0] is None:
+        return {}
+    cursor.execute("SELECT version, checksum, applied_at FROM schema_migrations")
+    return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+def get_status():
+    """Every known migration with whether and when it was applied"""
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        applied = _applied(cursor)
+        result = []
+        for migration in load_migrations():
+            checksum, applied_at = applied.get(migration.version, (None, None))
+            result.append({
+                'version': migration.version,
+                'name': migration.name,
+                'applied': checksum is not None,
+                'applied_at': applied_at,
+                # The file was edited after it ran - the change never reached this database
+                'modified': checksum is not None and checksum != migration.checksum,
+            })
+        return result
+    finally:
+        conn.close()
+
+def get_pending():
+    """Migrations not yet applied"""
+    return [entry for entry in get_status() if not entry['applied']]
+
+def _check_checksums(migrations, applied):
+    modified = [
+        f"{migration.version:04d}_{migration.name}" for migration in migrations
+        if migration.version in applied and applied[migration.version][0] != migration.checksum
+    ]
+    if modified:
+        raise ChecksumMismatch(
+            f"Applied migration(s) changed since they ran: {', '.join(modified)} - "
+            "restore the original files and put the change in a new migration"
+        )
+
+def migrate():
+    """
+    Apply every pending migration in order
+
+    Returns:
+        list: Versions applied by this call
+
+    Raises:
+        ChecksumMismatch if an applied migration's file was edited - nothing is applied
+    """
+    applied_now = []
+    migrations = load_migrations()
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        applied = _applied(cursor)
+        conn.rollback()
+        _check_checksums(migrations, applied)
+        for migration in migrations:
+            if migration.version in applied:
+                continue
+            try:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+                _ensure_table(cursor)
+                # Another instance may have applied it while we waited for the lock
+                cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (migration.version,))
+                if cursor.fetchone() is None:
+                    cursor.execute(migration.sql)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                        (migration.version, migration.name, migration.checksum)
+                    )
+                    applied_now.append(migration.version)
+                    logger.info(f"Applied migration {migration.version:04d}_{migration.name}")
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise RuntimeError(f"Migration {migration.version:04d}_{migration.name} failed: {e}") from e
+        return applied_now
+    finally:
+        conn.close()
+
+def startup_check(raise_errors=False):
+    """
+    Apply or report pending migrations according to MIGRATIONS_ON_STARTUP
+
+    Args:
+        raise_errors: Let a failed apply propagate (so startup fails) instead of logging it
+    """
+    if MIGRATIONS_ON_STARTUP == "off":
+        return
+    try:
+        if MIGRATIONS_ON_STARTUP == "apply":
+            applied = migrate()
+            if applied:
+                logger.info(f"Schema migrated: applied {len(applied)} migration(s)")
+            return
+        status = get_status()
+        modified = [f"{entry['version']:04d}_{entry['name']}" for entry in status if entry['modified']]
+        if modified:
+            logger.error(f"Applied migrations changed since they ran: {', '.join(modified)} - migrate will refuse to run")
+        pending = [entry for entry in status if not entry['applied']]
+        if pending:
+            names = ', '.join(f"{entry['version']:04d}_{entry['name']}" for entry in pending)
+            logger.warning(f"Pending schema migrations: {names} - run: python migrations.py migrate")
+    except Exception as e:
+        logger.error(f"Schema migration check failed: {e}")
+        if raise_errors and MIGRATIONS_ON_STARTUP == "apply":
+            raise
+
+def expected_indexes():
+    """Index names created by the migration files"""
+    names = []
+    for migration in load_migrations():
+        names.extend(_INDEX_NAME.findall(migration.sql))
+    return names
+
+def index_report(min_rows=INDEX_REPORT_MIN_ROWS):
+    """
+    Index health from the catalog and the cumulative statistics views
+
+    Returns:
+        dict with
+            missing: expected indexes that do not exist
+            unused: non-unique indexes never scanned since stats_reset (pg_stat_user_indexes)
+            sequential_scan_tables: tables of at least min_rows rows read by sequential
+                                    scans more often than through an index
+            stats_reset: when the statistics were last reset
+    """
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in expected_indexes() if name not in existing]
+
+        cursor.execute("""
+            SELECT s.relname, s.indexrelname, s.idx_scan, pg_relation_size(s.indexrelid)
+            FROM pg_stat_user_indexes s
+            JOIN pg_index i ON i.indexrelid = s.indexrelid
+            WHERE s.idx_scan = 0 AND NOT i.indisunique AND NOT i.indisprimary
+            ORDER BY pg_relation_size(s.indexrelid) DESC
+        """)
+        unused = [
+            {'table': row[0], 'index': row[1], 'scans': row[2], 'size_bytes': row[3]}
+            for row in cursor.fetchall()
+        ]
+
+        cursor.execute("""
+            SELECT relname, seq_scan, coalesce(idx_scan, 0), n_live_tup
+            FROM pg_stat_user_tables
+            WHERE n_live_tup >= %s AND seq_scan > coalesce(idx_scan, 0)
+            ORDER BY seq_scan DESC
+        """, (min_rows,))
+        sequential = [
+            {'table': row[0], 'seq_scans': row[1], 'index_scans': row[2], 'rows': row[3]}
+            for row in cursor.fetchall()
+        ]
+
+        cursor.execute("SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()")
+        row = cursor.fetchone()
+        return {
+            'missing': missing,
+            'unused': unused,
+            'sequential_scan_tables': sequential,
+            'stats_reset': row[0] if row else None,
+        }
+    finally:
+        conn.close()
+
+def _print_status():
+    for entry in get_status():
+        state = 'applied' if entry['applied'] else 'pending'
+        if entry['modified']:
+            state += ' (file changed since it was applied)'
+        print(f" {entry['version']:04d}_{entry['name']}: {state}")
+
+def _print_indexes():
+    report = index_report()
+    print(f" Statistics since: {report['stats_reset'] or 'server start'}")
+    print(f" Missing indexes: {', '.join(report['missing']) or 'none'}")
+    for entry in report['unused']:
+        print(f" Unused index: {entry['index']} on {entry['table']} ({entry['size_bytes']} bytes)")
+    for entry in report['sequential_scan_tables']:
+        print(f" Mostly sequential scans: {entry['table']} ({entry['rows']} rows, "
+              f"{entry['seq_scans']} seq / {entry['index_scans']} index scans)")
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) == 2 else None
+    if command == "status":
+        _print_status()
+    elif command == "migrate":
+        applied = migrate()
+        print(f" Applied {len(applied)} migration(s)")
+    elif command == "indexes":
+        _print_indexes()
+    else:
+        print("Usage: python migrations.py status|migrate|indexes")
+        sys.exit(1)
@@ -0,0 +1,47 @@
+-- Core tables the app was originally deployed with
+-- Existing databases already have them, so every statement is a no-op there;
+-- fresh databases get the layout auth.py and crud.py expect.
+
+CREATE TABLE IF NOT EXISTS users (
+    id             SERIAL PRIMARY KEY,
+    email          TEXT NOT NULL,
+    name           TEXT,
+    role           TEXT NOT NULL DEFAULT 'presales_viewer',
+    created_at     TIMESTAMP NOT NULL DEFAULT now(),
+    invite_status  TEXT NOT NULL DEFAULT 'pending'
+);
+
+-- Pending / processed invitations, looked up by token from the approve / reject links
+CREATE TABLE IF NOT EXISTS invite_tokens (
+    id          SERIAL PRIMARY KEY,
+    token       TEXT NOT NULL,
+    email       TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    created_at  TIMESTAMP NOT NULL DEFAULT now(),
+    expires_at  TIMESTAMP NOT NULL
+);
+
+-- One row per opportunity; columns match crud.INSERT_COLUMNS
+CREATE TABLE IF NOT EXISTS presales_tracking (
+    id                        SERIAL PRIMARY KEY,
+    account_name              TEXT NOT NULL,
+    opportunity               TEXT,
+    region_location           TEXT,
+    region                    TEXT,
+    sub_region                TEXT,
+    deal_value_usd            NUMERIC,
+    scoping_doc               TEXT,
+    vector_link               TEXT,
+    charging_on_vector        TEXT,
+    period_of_presales_weeks  INTEGER,
+    status                    TEXT,
+    assignee_from_gsd         TEXT,
+    pursuit_lead              TEXT,
+    delivery_manager          TEXT,
+    presales_start_date       DATE,
+    expected_planned_start    DATE,
+    sow_signature_date        DATE,
+    staffing_completed_flag   BOOLEAN DEFAULT FALSE,
+    staffing_poc              TEXT,
+    remarks                   TEXT
+);
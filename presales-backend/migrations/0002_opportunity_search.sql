@@ -0,0 +1,22 @@
+-- Indexes backing the q= free-text search on GET /opportunities/
+-- The indexed expressions must match crud.SEARCH_TEXT_SQL exactly.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Word search: to_tsvector(...) @@ websearch_to_tsquery('simple', q)
+CREATE INDEX IF NOT EXISTS idx_presales_tracking_search_tsv
+    ON presales_tracking
+    USING gin (to_tsvector('simple',
+        (coalesce(account_name, '') || ' ' || coalesce(opportunity, '') || ' ' ||
+         coalesce(remarks, '') || ' ' || coalesce(assignee_from_gsd, '') || ' ' ||
+         coalesce(pursuit_lead, '') || ' ' || coalesce(delivery_manager, '') || ' ' ||
+         coalesce(staffing_poc, ''))));
+
+-- Substring search: lower(...) LIKE '%q%'
+CREATE INDEX IF NOT EXISTS idx_presales_tracking_search_trgm
+    ON presales_tracking
+    USING gin (lower(
+        (coalesce(account_name, '') || ' ' || coalesce(opportunity, '') || ' ' ||
+         coalesce(remarks, '') || ' ' || coalesce(assignee_from_gsd, '') || ' ' ||
+         coalesce(pursuit_lead, '') || ' ' || coalesce(delivery_manager, '') || ' ' ||
+         coalesce(staffing_poc, ''))) gin_trgm_ops);
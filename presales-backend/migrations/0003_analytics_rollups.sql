@@ -0,0 +1,28 @@
+-- Per region x status x month rollups behind GET /analytics/summary
+-- Maintained incrementally by crud.create_record / update_record / delete_record
+-- in the same transaction as the write. NULL region/status are stored as ''
+-- and NULL months as '-infinity' so they can take part in the unique key.
+
+CREATE TABLE IF NOT EXISTS presales_rollups (
+    region          TEXT NOT NULL DEFAULT '',
+    status          TEXT NOT NULL DEFAULT '',
+    month           DATE NOT NULL DEFAULT '-infinity',
+    record_count    BIGINT NOT NULL DEFAULT 0,
+    deal_value_sum  NUMERIC NOT NULL DEFAULT 0,
+    staffed_count   BIGINT NOT NULL DEFAULT 0,
+    refreshed_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (region, status, month)
+);
+
+-- Initial backfill; analytics.rebuild_rollups() does the same on demand
+INSERT INTO presales_rollups (region, status, month, record_count, deal_value_sum, staffed_count, refreshed_at)
+SELECT coalesce(region, ''),
+       coalesce(status, ''),
+       coalesce(date_trunc('month', coalesce(presales_start_date, expected_planned_start))::date, '-infinity'::date),
+       count(*),
+       coalesce(sum(deal_value_usd), 0),
+       count(*) FILTER (WHERE staffing_completed_flag),
+       now()
+FROM presales_tracking
+GROUP BY 1, 2, 3
+ON CONFLICT (region, status, month) DO NOTHING;
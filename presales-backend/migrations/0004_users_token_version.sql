@@ -0,0 +1,4 @@
+-- Per-user revocation counter for claims-based JWTs (JWT_TOKEN_FORMAT=claims)
+-- auth.update_user_role bumps it; tokens carrying an older version are rejected.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,20 @@
+-- Durable outbound email queue drained by email_outbox.OutboxWorker
+-- status: pending -> sent, or pending -> dead after EMAIL_OUTBOX_MAX_ATTEMPTS failures
+
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id               BIGSERIAL PRIMARY KEY,
+    to_email         TEXT NOT NULL,
+    subject          TEXT NOT NULL,
+    body             TEXT NOT NULL,
+    status           TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'dead')),
+    attempts         INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_error       TEXT,
+    created_at       TIMESTAMPTZ NOT NULL DEFAULT now(),
+    sent_at          TIMESTAMPTZ
+);
+
+-- Worker claim query: pending rows that are due, oldest first
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due
+    ON email_outbox (next_attempt_at, id)
+    WHERE status = 'pending';
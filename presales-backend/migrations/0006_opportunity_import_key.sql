@@ -0,0 +1,5 @@
+-- Lookup index for the CSV import merge, which matches existing rows on
+-- (account_name, opportunity) - see importer.import_csv
+
+CREATE INDEX IF NOT EXISTS idx_presales_tracking_account_opportunity
+    ON presales_tracking (account_name, opportunity);
@@ -0,0 +1,14 @@
+-- Change tracking behind conditional GETs (ETag / Last-Modified / If-Match)
+-- presales_tracking.updated_at is set by every crud / importer write and
+-- validates single records. presales_data_version is one row bumped in the
+-- same transaction as every write and validates list responses cheaply.
+
+ALTER TABLE presales_tracking ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE TABLE IF NOT EXISTS presales_data_version (
+    id          SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version     BIGINT NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO presales_data_version (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
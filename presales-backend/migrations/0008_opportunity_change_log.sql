@@ -0,0 +1,12 @@
+-- Row-level change log behind GET /opportunities/stream (changefeed.py)
+-- crud.record_changes appends one row per changed record under the data
+-- version of its transaction and NOTIFYs presales_changes on commit.
+-- Requires 0007_opportunity_versioning.sql.
+
+CREATE TABLE IF NOT EXISTS presales_change_log (
+    version     BIGINT NOT NULL,
+    record_id   BIGINT NOT NULL,
+    op          TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+    changed_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (version, record_id)
+);
@@ -0,0 +1,13 @@
+-- Retention bookkeeping for presales_change_log (GET /opportunities/changes)
+-- log_floor is the oldest version "changes since" can still be answered for.
+-- It starts at the current version (nothing before the log existed was
+-- recorded) and crud.prune_change_log raises it as old entries are dropped:
+--     python crud.py prune-changes
+-- Requires 0008_opportunity_change_log.sql.
+
+ALTER TABLE presales_data_version ADD COLUMN IF NOT EXISTS log_floor BIGINT;
+
+UPDATE presales_data_version SET log_floor = version WHERE log_floor IS NULL;
+
+ALTER TABLE presales_data_version ALTER COLUMN log_floor SET DEFAULT 0;
+ALTER TABLE presales_data_version ALTER COLUMN log_floor SET NOT NULL;
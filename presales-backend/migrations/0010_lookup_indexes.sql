@@ -0,0 +1,26 @@
+-- Indexes behind the hot lookups
+-- auth.get_user_by_email / create_or_update_user: WHERE email = %s on every login and token check
+-- auth.approve_invite / reject_invite: WHERE token = %s
+-- crud.build_filter_clause: status / region / sub_region = ANY(%s) and the date range filters
+
+CREATE INDEX IF NOT EXISTS idx_users_email
+    ON users (email);
+
+CREATE INDEX IF NOT EXISTS idx_invite_tokens_token
+    ON invite_tokens (token);
+
+CREATE INDEX IF NOT EXISTS idx_presales_tracking_status
+    ON presales_tracking (status);
+
+CREATE INDEX IF NOT EXISTS idx_presales_tracking_region
+    ON presales_tracking (region, sub_region);
+
+CREATE INDEX IF NOT EXISTS idx_presales_tracking_presales_start_date
+    ON presales_tracking (presales_start_date);
+
+CREATE INDEX IF NOT EXISTS idx_presales_tracking_sow_signature_date
+    ON presales_tracking (sow_signature_date);
+
+-- crud.prune_change_log finds the newest version older than the retention window
+CREATE INDEX IF NOT EXISTS idx_presales_change_log_changed_at
+    ON presales_change_log (changed_at);
@@ -0,0 +1,12 @@
+-- Single-use tickets that authenticate /opportunities/stream (EventSource cannot
+-- send an Authorization header, and the JWT must not end up in a URL)
+-- Only the SHA-256 of the ticket is stored; auth.redeem_stream_ticket deletes the row
+
+CREATE TABLE IF NOT EXISTS stream_tickets (
+    ticket_hash  TEXT PRIMARY KEY,
+    email        TEXT NOT NULL,
+    expires_at   TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_stream_tickets_expires_at
+    ON stream_tickets (expires_at);
@@ -0,0 +1,70 @@
+"""
+Opportunity request models
+Shared by the API (main.py) and the CSV importer (importer.py)
+"""
+
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date
+
+class OpportunityCreate(BaseModel):
+    """
+    Opportunity creation model
+    FIXED: All fields except account_name are Optional and can be None
+    charging_on_vector is now a string (not bool) to match UI options like "Yes", "No", "Not Yet"
+    """
+    account_name: str  # Only required field
+    opportunity: Optional[str] = None
+    region_location: Optional[str] = None
+    region: Optional[str] = None
+    sub_region: Optional[str] = None
+    deal_value_usd: Optional[float] = None
+    scoping_doc: Optional[str] = None
+    vector_link: Optional[str] = None
+    charging_on_vector: Optional[str] = None  # FIXED: Changed from bool to Optional[str]
+    period_of_presales_weeks: Optional[int] = None
+    status: Optional[str] = None
+    assignee_from_gsd: Optional[str] = None
+    pursuit_lead: Optional[str] = None
+    delivery_manager: Optional[str] = None
+    presales_start_date: Optional[date] = None
+    expected_planned_start: Optional[date] = None
+    sow_signature_date: Optional[date] = None
+    staffing_completed_flag: Optional[bool] = False  # FIXED: Made optional with default False
+    staffing_poc: Optional[str] = None
+    remarks: Optional[str] = None
+    
+    class Config:
+        # Allow None values to be passed explicitly
+        use_enum_values = True
+        validate_assignment = True
+
+class OpportunityUpdate(BaseModel):
+    """
+    Opportunity update model
+    FIXED: All fields are Optional to allow partial updates
+    """
+    account_name: Optional[str] = None
+    opportunity: Optional[str] = None
+    region_location: Optional[str] = None
+    region: Optional[str] = None
+    sub_region: Optional[str] = None
+    deal_value_usd: Optional[float] = None
+    scoping_doc: Optional[str] = None
+    vector_link: Optional[str] = None
+    charging_on_vector: Optional[str] = None  # FIXED: Changed from Optional[bool] to Optional[str]
+    period_of_presales_weeks: Optional[int] = None
+    status: Optional[str] = None
+    assignee_from_gsd: Optional[str] = None
+    pursuit_lead: Optional[str] = None
+    delivery_manager: Optional[str] = None
+    presales_start_date: Optional[date] = None
+    expected_planned_start: Optional[date] = None
+    sow_signature_date: Optional[date] = None
+    staffing_completed_flag: Optional[bool] = None
+    staffing_poc: Optional[str] = None
+    remarks: Optional[str] = None
+    
+    class Config:
+        use_enum_values = True
+        validate_assignment = True
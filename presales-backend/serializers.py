@@ -0,0 +1,199 @@
+"""
+Serialization Module
+Fast and compact rendering for large record lists.
+
+The default FastAPI path builds a dict per row and then walks every value
+through jsonable_encoder. Here the column layout is taken once per query and
+rows are encoded directly with orjson (stdlib json as a fallback), returning
+pre-rendered bytes. Clients opt in through the Accept header:
+
+    Accept: application/json; shape=records   -> same body as the default path
+    Accept: application/json; shape=columnar  -> {"columns": [...], "rows": [[...]], ...}
+    Accept: application/msgpack               -> the records body as MessagePack
+    Accept: application/vnd.apache.arrow.stream -> Arrow IPC stream (needs pyarrow)
+
+msgpack and pyarrow are optional; asking for a format whose package is not
+installed raises NotAcceptable.
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SHAPES = ('records', 'columnar')
+
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+MEDIA_TYPES = {
+    'records': 'application/json',
+    'columnar': 'application/json',
+    'msgpack': 'application/msgpack',
+    'arrow': ARROW_STREAM_MEDIA_TYPE,
+}
+
+class NotAcceptable(Exception):
+    """The requested representation needs a package that is not installed"""
+
+def _default(value):
+    """Types orjson / json / msgpack cannot encode natively - mirrors FastAPI's encoders"""
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+def dumps(payload):
+    """Encode a payload to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode('utf-8')
+
+def packb(payload):
+    """Encode a payload to MessagePack bytes (dates as ISO strings, like the JSON body)"""
+    if msgpack is None:
+        raise NotAcceptable("application/msgpack requires the msgpack package")
+    return msgpack.packb(payload, default=_default, datetime=False)
+
+def _media_ranges(accept):
+    """(media_type, params, quality) from an Accept header, best first"""
+    ranges = []
+    for position, media_range in enumerate((accept or '').split(',')):
+        media_type, *raw_params = [part.strip() for part in media_range.split(';')]
+        if not media_type:
+            continue
+        params, quality = {}, 1.0
+        for param in raw_params:
+            name, _, value = param.partition('=')
+            name, value = name.strip().lower(), value.strip().strip('"')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+            else:
+                params[name] = value.lower()
+        if quality > 0:
+            ranges.append((-quality, position, media_type.lower(), params))
+    return [(media_type, params) for _, _, media_type, params in sorted(ranges)]
+
+def negotiate(accept, tabular=True):
+    """
+    Representation requested through the Accept header, or None for the default JSON path
+    Returns 'records', 'columnar', 'msgpack' or 'arrow'; tabular=False (for payloads that
+    are not a record list) only considers msgpack
+
+    Raises:
+        ValueError for an unknown shape
+    """
+    for media_type, params in _media_ranges(accept):
+        if media_type in MSGPACK_MEDIA_TYPES:
+            return 'msgpack'
+        if tabular and media_type == ARROW_STREAM_MEDIA_TYPE:
+            return 'arrow'
+        if media_type in ('application/json', 'application/*', '*/*'):
+            shape = params.get('shape') if tabular else None
+            if shape is not None and shape not in SHAPES:
+                raise ValueError(f"Invalid shape. Must be one of: {', '.join(SHAPES)}")
+            return shape
+    return None
+
+# Postgres type OID -> Arrow type name, for schemas taken from cursor.description
+_ARROW_TYPES = {
+    16: 'bool_',
+    20: 'int64',
+    21: 'int16',
+    23: 'int32',
+    700: 'float32',
+    701: 'float64',
+    1700: 'float64',      # numeric - notebooks want floats, not decimal128
+    1082: 'date32',
+    1114: 'timestamp',
+    1184: 'timestamptz',
+}
+
+def _arrow_type(pa, type_code):
+    name = _ARROW_TYPES.get(type_code, 'string')
+    if name == 'timestamp':
+        return pa.timestamp('us')
+    if name == 'timestamptz':
+        return pa.timestamp('us', tz='UTC')
+    return getattr(pa, name)()
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise NotAcceptable(f"{ARROW_STREAM_MEDIA_TYPE} requires the pyarrow package")
+    return pyarrow
+
+def arrow_schema(columns, type_codes, metadata=None):
+    """Arrow schema from column names and Postgres type OIDs"""
+    pa = _import_pyarrow()
+    fields = [pa.field(name, _arrow_type(pa, code)) for name, code in zip(columns, type_codes)]
+    return pa.schema(fields, metadata={k: str(v) for k, v in (metadata or {}).items() if v is not None})
+
+def arrow_batch(schema, rows):
+    """Arrow RecordBatch for rows in schema column order"""
+    pa = _import_pyarrow()
+    arrays = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in rows]
+        if pa.types.is_floating(field.type):
+            values = [float(v) if v is not None else None for v in values]
+        elif pa.types.is_string(field.type):
+            values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def arrow_stream(schema, batches):
+    """Bytes of an Arrow IPC stream - a schema message followed by each batch"""
+    pa = _import_pyarrow()
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+def render_rows(payload, columns, rows, shape, type_codes=None):
+    """
+    Encoded body for a list response whose records are (columns, rows)
+
+    Args:
+        payload: the other response keys (count, next_cursor, ...)
+        columns: column names, computed once for the query
+        rows: row tuples in column order
+        shape: 'records' puts them under data as objects, 'columnar' under columns / rows,
+               'msgpack' is the records body as MessagePack, 'arrow' an Arrow IPC stream
+               with the other keys as schema metadata
+        type_codes: Postgres type OIDs per column (needed for 'arrow')
+    """
+    if shape == 'arrow':
+        schema = arrow_schema(columns, type_codes or [None] * len(columns), payload)
+        return arrow_stream(schema, [arrow_batch(schema, rows)])
+    body = dict(payload)
+    if shape == 'columnar':
+        body['columns'] = list(columns)
+        body['rows'] = rows if isinstance(rows, list) else list(rows)
+    else:
+        body['data'] = [dict(zip(columns, row)) for row in rows]
+    if shape == 'msgpack':
+        return packb(body)
+    return dumps(body)
+
+def render(payload, representation):
+    """Encoded body for a plain (non-tabular) payload - 'msgpack' or JSON"""
+    if representation == 'msgpack':
+        return packb(payload)
+    return dumps(payload)
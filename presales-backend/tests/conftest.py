@@ -0,0 +1,101 @@
+"""
+Shared test setup
+The backend modules are imported from the directory above; no database or
+SMTP server is needed - tests use the fakes below or locally generated keys.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+class FakeCursor:
+    """DB-API cursor over a FakeConnection; answers come from its handler"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._rows = []
+        self.rowcount = -1
+
+    @property
+    def description(self):
+        return self.connection.description
+
+    def execute(self, operation, args=(), stream=None):
+        conn = self.connection
+        if not conn._in_transaction and not conn.autocommit:
+            conn._in_transaction = True
+        conn.statements.append((operation, tuple(args or ())))
+        rows = conn.handler(operation, tuple(args or ())) if conn.handler else None
+        self._rows = list(rows or [])
+        self.rowcount = len(self._rows)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    """
+    Stand-in for a pg8000 connection recording every statement
+    handler(sql, args) returns the rows a statement produces
+    """
+
+    def __init__(self, handler=None):
+        self.handler = handler
+        self.description = None  # What every cursor reports, e.g. (("id", 20), ("name", 25))
+        self.statements = []
+        self.autocommit = False
+        self._in_transaction = False
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+        self._in_transaction = False
+
+    def rollback(self):
+        if self._in_transaction:
+            self.rollbacks += 1
+        self._in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    """
+    Replace the database pool with one over FakeConnections
+    Returns a list that collects the connections it opens; set
+    fake_pool.handler to answer queries
+    """
+    import database
+
+    class Opened(list):
+        handler = None
+        description = None
+
+    opened = Opened()
+
+    def creator():
+        conn = FakeConnection(lambda sql, args: opened.handler(sql, args) if opened.handler else None)
+        conn.description = opened.description
+        opened.append(conn)
+        return conn
+
+    pool = database.ConnectionPool(creator, max_size=4, healthcheck_after=0)
+    monkeypatch.setattr(database, "_pool", pool)
+    opened.pool = pool
+    yield opened
+    pool.close()
@@ -0,0 +1,57 @@
+import re
+
+import pytest
+
+import analytics
+
+def _select_list(sql):
+    """Top-level expressions between the outer SELECT and its FROM"""
+    body = sql.split("SELECT", 1)[1]
+    expressions, depth, current = [], 0, ""
+    for char in body:
+        depth += char == "("
+        depth -= char == ")"
+        if char == "," and depth == 0:
+            expressions.append(current.strip())
+            current = ""
+            continue
+        current += char
+        if depth == 0 and re.search(r"\sFROM\s*$", current):
+            expressions.append(re.sub(r"\s+FROM\s*$", "", current).strip())
+            return expressions
+    raise AssertionError("no FROM in query")
+
+def _aggregate_of_nothing(expression):
+    """What Postgres returns for expression over zero input rows"""
+    if expression.startswith("GROUPING("):
+        return 1
+    if expression.startswith("coalesce("):
+        return 0
+    if expression.startswith("count("):
+        return 0
+    if expression.startswith(("sum(", "max(", "min(", "avg(")) or re.fullmatch(r"\w+", expression):
+        return None
+    if expression == "now()":
+        return None
+    raise AssertionError(f"unexpected select expression {expression}")
+
+@pytest.fixture
+def nothing_matches(fake_pool):
+    """Every summary query sees zero rows - only the () grouping set produces its row"""
+    fake_pool.handler = lambda sql, args: [tuple(_aggregate_of_nothing(e) for e in _select_list(sql))]
+
+@pytest.mark.parametrize("source,filters", [
+    ("rollup", None),
+    ("rollup", {"region": ["Nowhere"]}),
+    ("live", {"status": ["Lost"]}),
+])
+def test_summary_of_no_matching_rows_is_all_zeros(nothing_matches, monkeypatch, source, filters):
+    monkeypatch.setattr(analytics, "ANALYTICS_SOURCE", source)
+
+    summary = analytics.get_summary(filters)
+
+    assert summary["source"] == source
+    assert summary["totals"] == {'count': 0, 'total_deal_value': 0.0, 'avg_deal_value': 0.0,
+                                 'active_count': 0, 'staffed_count': 0}
+    assert summary["monthly"] == summary["by_region"] == summary["by_status"] == []
+    assert summary["as_of"] is not None
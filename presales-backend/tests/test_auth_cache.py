@@ -0,0 +1,38 @@
+import pytest
+
+import auth
+import metrics
+
+@pytest.fixture
+def caches(monkeypatch):
+    user_cache = auth.TTLCache(max_size=8, ttl=30)
+    token_version_cache = auth.TTLCache(max_size=8, ttl=30)
+    monkeypatch.setattr(auth, "user_cache", user_cache)
+    monkeypatch.setattr(auth, "token_version_cache", token_version_cache)
+    return user_cache, token_version_cache
+
+def _samples(prefix):
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in metrics.render().splitlines() if line.startswith(prefix)
+    }
+
+def test_cache_hits_misses_and_size_are_exported(caches, monkeypatch):
+    lookups = []
+    monkeypatch.setattr(auth, "get_user_by_email", lambda email: lookups.append(email) or {'email': email})
+    monkeypatch.setattr(auth, "get_token_version", lambda user_id: 3)
+
+    auth.get_cached_user_by_email("dana@google.com")
+    auth.get_cached_user_by_email("dana@google.com")
+    auth.get_cached_user_by_email("eli@google.com")
+    auth.get_cached_token_version("7")
+
+    assert lookups == ["dana@google.com", "eli@google.com"]
+    assert _samples("auth_cache_") == {
+        'auth_cache_lookups_total{cache="user",outcome="hit"}': 1,
+        'auth_cache_lookups_total{cache="user",outcome="miss"}': 2,
+        'auth_cache_lookups_total{cache="token_version",outcome="hit"}': 0,
+        'auth_cache_lookups_total{cache="token_version",outcome="miss"}': 1,
+        'auth_cache_entries{cache="user"}': 2,
+        'auth_cache_entries{cache="token_version"}': 1,
+    }
@@ -0,0 +1,56 @@
+import io
+import csv
+import random
+
+import benchmark
+import crud
+
+def _report(**scenarios):
+    return {"results": {"1000": scenarios}}
+
+def _result(throughput=100.0, p50=10.0, p95=20.0, p99=30.0, errors=0):
+    return {"throughput_rps": throughput, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "errors": errors}
+
+def test_seed_columns_match_the_insert_columns():
+    assert benchmark.SEED_COLUMNS == crud.INSERT_COLUMNS
+    assert set(benchmark.synthetic_record(random.Random(1))) == set(crud.INSERT_COLUMNS)
+
+def test_csv_chunks_split_rows_and_write_nulls_as_empty_fields():
+    rows = [(i, None, 'say "hi", then\nleave', True) for i in range(5)]
+
+    chunks = list(benchmark._csv_chunks(rows, chunk_rows=2))
+
+    assert len(chunks) == 3
+    parsed = list(csv.reader(io.StringIO("".join(chunks))))
+    assert parsed == [[str(i), '', 'say "hi", then\nleave', 'True'] for i in range(5)]
+    assert list(benchmark._csv_chunks([], chunk_rows=2)) == []
+
+def test_compare_flags_throughput_and_tail_latency_regressions():
+    rows = benchmark.compare_reports(
+        _report(list=_result(), detail=_result()),
+        _report(list=_result(throughput=80.0, p99=40.0), detail=_result(throughput=95.0, p50=30.0, p95=21.0)),
+    )
+    by_name = {row["scenario"]: row for row in rows}
+
+    assert by_name["list"]["regressions"] == ["throughput_rps", "p99_ms"]
+    assert by_name["list"]["throughput_rps"] == {"baseline": 100.0, "current": 80.0, "change": -0.2}
+    # Within tolerance, and p50 alone never counts as a regression
+    assert by_name["detail"]["regressions"] == []
+
+def test_compare_reports_new_errors_even_when_latency_is_unchanged():
+    rows = benchmark.compare_reports(_report(list=_result()), _report(list=_result(errors=3)))
+    assert rows[0]["regressions"] == ["errors"]
+
+    rows = benchmark.compare_reports(_report(list=_result(errors=3)), _report(list=_result(errors=3)))
+    assert rows[0]["regressions"] == []
+
+def test_compare_reports_results_without_a_baseline(capsys):
+    baseline = _report(list=_result())
+    current = {"results": {"1000": {"list": _result(), "search": _result()}, "10000": {"list": _result()}}}
+
+    rows = benchmark.compare_reports(baseline, current)
+
+    missing = sorted((row["size"], row["scenario"]) for row in rows if row.get("baseline_missing"))
+    assert missing == [(1000, "search"), (10000, "list")]
+    assert benchmark.print_comparison(baseline, current, 0.10) == 0
+    assert capsys.readouterr().out.count("no baseline") == 2
@@ -0,0 +1,38 @@
+import asyncio
+import threading
+
+import changefeed
+import crud
+from conftest import FakeConnection
+
+def test_subscribe_does_not_wait_for_start_to_connect(monkeypatch):
+    hub = changefeed.ChangeHub()
+    connecting = threading.Event()
+    release = threading.Event()
+
+    def slow_listen():
+        connecting.set()
+        release.wait(5)
+        return FakeConnection()
+
+    monkeypatch.setattr(hub, "_listen", slow_listen)
+    monkeypatch.setattr(crud, "get_change_position", lambda: (0, 0))
+    monkeypatch.setattr(crud, "get_changes_after", lambda version, record_id: [])
+
+    async def open_stream():
+        hub.unsubscribe(hub.subscribe())
+
+    starter = threading.Thread(target=hub.start)
+    starter.start()
+    try:
+        assert connecting.wait(5)
+        # Stands in for the event loop: it must not block on the connecting start()
+        stream = threading.Thread(target=asyncio.run, args=(open_stream(),))
+        stream.start()
+        stream.join(1)
+        assert not stream.is_alive(), "subscribe() waited for start() to connect"
+    finally:
+        release.set()
+        starter.join(5)
+        hub.stop()
+    assert hub.position == (0, 0)
@@ -0,0 +1,114 @@
+import re
+import socket
+import struct
+import threading
+import importlib.metadata
+from pathlib import Path
+
+import pytest
+import pg8000
+
+import database
+
+def _pinned_pg8000():
+    requirements = Path(database.__file__).with_name("requirements.txt").read_text()
+    return re.search(r"^pg8000==(\S+)", requirements, re.MULTILINE).group(1)
+
+def _message(code, body=b""):
+    return code + struct.pack("!i", len(body) + 4) + body
+
+class ScriptedServer(threading.Thread):
+    """
+    Just enough of the Postgres wire protocol for pg8000 to prepare and run
+    SELECT 1 - every statement returns a single int4 row
+    """
+
+    def __init__(self, sock):
+        super().__init__(daemon=True)
+        self.sock = sock
+        self.received = []
+
+    def _read(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+
+    def run(self):
+        try:
+            length, = struct.unpack("!i", self._read(4))
+            if self._read(length - 4) == struct.pack("!i", 80877103):
+                # SSLRequest (newer pg8000 always asks) - decline, the startup packet follows
+                self.sock.sendall(b"N")
+                length, = struct.unpack("!i", self._read(4))
+                self._read(length - 4)
+            self.sock.sendall(_message(b"R", struct.pack("!i", 0)) + _message(b"Z", b"I"))
+            pending = b""
+            while True:
+                code = self._read(1)
+                length, = struct.unpack("!i", self._read(4))
+                self._read(length - 4)
+                self.received.append(code)
+                if code == b"X":
+                    return
+                if code == b"Q":
+                    self.sock.sendall(_message(b"C", b"BEGIN\0") + _message(b"Z", b"T"))
+                elif code == b"P":
+                    pending += _message(b"1")
+                elif code == b"D":
+                    column = b"?column?\0" + struct.pack("!ihihih", 0, 0, 23, 4, -1, 0)
+                    pending += _message(b"t", struct.pack("!h", 0))
+                    pending += _message(b"T", struct.pack("!h", 1) + column)
+                elif code == b"B":
+                    pending += _message(b"2")
+                elif code == b"E":
+                    pending += _message(b"D", struct.pack("!hi", 1, 1) + b"1")
+                    pending += _message(b"C", b"SELECT 1\0")
+                elif code == b"C":
+                    pending += _message(b"3")
+                elif code == b"S":
+                    self.sock.sendall(pending + _message(b"Z", b"T"))
+                    pending = b""
+        except (EOFError, OSError):
+            pass
+
+@pytest.fixture
+def pg8000_connection():
+    client, server_sock = socket.socketpair()
+    server = ScriptedServer(server_sock)
+    server.start()
+    conn = pg8000.dbapi.Connection("flux", sock=client)
+    conn.server = server
+    yield conn
+    conn.close()
+    server.join(5)
+    server_sock.close()
+
+def test_pinned_pg8000_is_installed():
+    installed = importlib.metadata.version("pg8000")
+    if installed != _pinned_pg8000():
+        pytest.skip(f"pg8000 {installed} is installed, requirements.txt pins {_pinned_pg8000()}")
+
+def test_statement_cache_works_with_installed_pg8000(pg8000_connection):
+    assert database.supports_prepared_statements(pg8000_connection)
+    cache = database.StatementCache(max_size=1)
+
+    assert cache.execute(pg8000_connection, "SELECT %s", (1,)).fetchall() == [[1]]
+    assert cache.execute(pg8000_connection, "SELECT %s", (1,)).fetchone() == [1]
+    assert pg8000_connection.server.received.count(b"P") == 1, "the second run reuses the statement"
+
+    cache.execute(pg8000_connection, "SELECT %s + 0", (1,))
+    assert len(cache) == 1
+    assert b"C" in pg8000_connection.server.received, "the evicted statement is closed on the server"
+
+def test_connections_without_the_internals_fall_back_to_a_cursor(fake_pool, monkeypatch):
+    monkeypatch.setattr(database, "DB_PREPARED_STATEMENTS", True)
+    fake_pool.handler = lambda sql, args: [("dana@google.com",)]
+
+    with database.db_connection() as conn:
+        assert not database.supports_prepared_statements(fake_pool[0])
+        assert conn.execute_prepared("SELECT email FROM users WHERE id = %s", (7,)).fetchone() == ("dana@google.com",)
+    assert fake_pool[0].statements == [("SELECT email FROM users WHERE id = %s", (7,))]
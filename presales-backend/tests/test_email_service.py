@@ -0,0 +1,112 @@
+import pytest
+
+import auth
+import email_outbox
+import email_service
+
+@pytest.fixture
+def smtp_configured(monkeypatch):
+    monkeypatch.setattr(email_service, "SMTP_AUTH", True)
+    monkeypatch.setattr(email_service, "SMTP_USERNAME", "flux@example.com")
+    monkeypatch.setattr(email_service, "SMTP_PASSWORD", "app-password")
+    monkeypatch.setattr(email_service, "SMTP_FROM_EMAIL", "flux@example.com")
+
+def _user_row_handler(sql, args):
+    if sql.lstrip().startswith("SELECT email, name, role FROM users"):
+        return [("dana@google.com", "Dana", "presales_viewer")]
+    if "UPDATE users" in sql:
+        return [(7, "dana@google.com", "Dana", "presales_creator", None)]
+    if "INSERT INTO email_outbox" in sql:
+        return [(41,)]
+    return []
+
+def test_outbox_email_is_queued_in_the_callers_transaction(fake_pool, smtp_configured, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_DELIVERY_MODE", "outbox")
+    fake_pool.handler = _user_row_handler
+
+    auth.update_user_role("7", "presales_creator", "Admin")
+
+    assert len(fake_pool) == 1, "the email must not check out a second connection"
+    conn = fake_pool[0]
+    statements = [sql for sql, _ in conn.statements]
+    outbox = next(i for i, sql in enumerate(statements) if "INSERT INTO email_outbox" in sql)
+    update = next(i for i, sql in enumerate(statements) if "UPDATE users" in sql)
+    assert update < outbox
+    assert conn.commits == 1
+
+def test_outbox_failure_rolls_back_the_change(fake_pool, smtp_configured, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_DELIVERY_MODE", "outbox")
+
+    def handler(sql, args):
+        if "INSERT INTO email_outbox" in sql:
+            raise RuntimeError("email_outbox is unavailable")
+        return _user_row_handler(sql, args)
+
+    fake_pool.handler = handler
+
+    with pytest.raises(RuntimeError):
+        auth.update_user_role("7", "presales_creator", "Admin")
+    assert fake_pool[0].commits == 0
+    assert fake_pool[0].rollbacks == 1
+
+def test_direct_email_is_sent_only_after_commit(fake_pool, smtp_configured, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_DELIVERY_MODE", "direct")
+    sent = []
+    monkeypatch.setattr(email_service.workers, "submit_email", lambda func, *args: sent.append(args))
+    fake_pool.handler = _user_row_handler
+
+    import database
+    conn = database.get_db()
+    cursor = conn.cursor()
+    email_service.send_email("dana@google.com", "Subject", "Body", cursor)
+    assert sent == []
+    conn.commit()
+    assert sent == [("dana@google.com", "Subject", "Body")]
+
+    email_service.send_email("dana@google.com", "Again", "Body", cursor)
+    conn.rollback()
+    conn.commit()
+    conn.close()
+    assert len(sent) == 1, "a rolled back transaction must not send its email"
+
+class FakeSMTP:
+    instances = []
+
+    def __init__(self, host, port, timeout=None):
+        self.calls = []
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        self.calls.append("starttls")
+
+    def login(self, username, password):
+        self.calls.append("login")
+
+    def send_message(self, message):
+        self.calls.append(("send", message["To"]))
+
+    def quit(self):
+        self.calls.append("quit")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.quit()
+
+@pytest.mark.parametrize("use_tls,use_auth,expected", [
+    (True, True, ["starttls", "login", ("send", "dana@google.com"), "quit"]),
+    (False, False, [("send", "dana@google.com"), "quit"]),
+])
+def test_direct_delivery_honours_tls_and_auth_settings(monkeypatch, use_tls, use_auth, expected):
+    import smtplib
+    FakeSMTP.instances.clear()
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    monkeypatch.setattr(email_outbox, "SMTP_USE_TLS", use_tls)
+    monkeypatch.setattr(email_outbox, "SMTP_AUTH", use_auth)
+
+    assert email_service._deliver_email("dana@google.com", "Subject", "Body") is True
+    assert FakeSMTP.instances[0].calls == expected
@@ -0,0 +1,62 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+import export
+
+def _table(rows):
+    """Fake handler serving rows through DECLARE / FETCH in batches"""
+    remaining = list(rows)
+
+    def handler(sql, args):
+        if sql.startswith("FETCH FORWARD"):
+            size = int(sql.split()[2])
+            batch, remaining[:] = remaining[:size], remaining[size:]
+            return batch
+        return []
+    return handler
+
+@pytest.fixture
+def described(fake_pool):
+    fake_pool.description = (("id", 20), ("account_name", 25))
+
+async def _download(export_format):
+    body = await export.open_export(export_format)
+    return b"".join([chunk async for chunk in body])
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_export_streams_every_row_and_returns_the_connection(fake_pool, described):
+    fake_pool.handler = _table([(i, f"Account {i}") for i in range(1, 1201)])
+
+    lines = asyncio.run(_download("csv")).decode().splitlines()
+
+    assert lines[0] == "id,account_name"
+    assert len(lines) == 1201
+    assert len(fake_pool) == 1
+    _wait_until(lambda: fake_pool.pool.stats()["in_use"] == 0)
+
+def test_export_slots_are_limited_and_released_on_disconnect(fake_pool, described, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(export, "_export_slots", slots)
+    fake_pool.handler = _table([(i, "Account") for i in range(1, 2000)])
+
+    async def scenario():
+        body = await export.open_export("ndjson")
+        first = await body.__anext__()
+        assert first
+        with pytest.raises(export.ExportBusy):
+            await export.open_export("ndjson")
+        # Client went away mid-download
+        await body.aclose()
+
+    asyncio.run(scenario())
+    # The close is queued on the DB executor
+    _wait_until(lambda: fake_pool.pool.stats()["in_use"] == 0)
+    assert slots.acquire(blocking=False)
@@ -0,0 +1,129 @@
+import time
+
+import pytest
+
+import id_tokens
+from benchmark import BENCH_GOOGLE_CLIENT_ID, GoogleStandIn
+
+class RotatedStandIn(GoogleStandIn):
+    KEY_ID = "flux-benchmark-rotated"
+
+class FakeResponse:
+    def __init__(self, certs, max_age):
+        self._certs = certs
+        self.headers = {"Cache-Control": f"public, max-age={max_age}"}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._certs
+
+class FakeSession:
+    """Serves whatever certificates are assigned to .certs; set .error to fail the fetch"""
+
+    def __init__(self, certs, max_age=3600):
+        self.certs = certs
+        self.max_age = max_age
+        self.error = None
+        self.requests = 0
+
+    def get(self, url, timeout=None):
+        self.requests += 1
+        if self.error:
+            raise self.error
+        return FakeResponse(dict(self.certs), self.max_age)
+
+@pytest.fixture(scope="module")
+def google():
+    return GoogleStandIn(0)
+
+@pytest.fixture(scope="module")
+def rotated():
+    return RotatedStandIn(0)
+
+@pytest.fixture(autouse=True)
+def empty_token_cache():
+    id_tokens.token_cache.clear()
+    yield
+    id_tokens.token_cache.clear()
+
+def _certificates(session):
+    return id_tokens.CertificateCache(url="https://certs.example.com", session=session)
+
+def _verify(token, certs):
+    return id_tokens.verify(token, BENCH_GOOGLE_CLIENT_ID, certs=certs)
+
+def test_valid_token_is_verified_and_cached(google):
+    certs = _certificates(FakeSession(google.certificates))
+    token = google.id_token("dana@google.com", "Dana")
+
+    assert _verify(token, certs)["email"] == "dana@google.com"
+    assert _verify(token, certs)["email"] == "dana@google.com"
+    assert id_tokens.token_cache.stats()["hits"] == 1
+
+@pytest.mark.parametrize("claims,message", [
+    ({"aud": "someone-else.apps.googleusercontent.com"}, "audience"),
+    ({"iss": "https://accounts.example.com"}, "issuer"),
+    ({"iat": int(time.time()) - 7200, "exp": int(time.time()) - 3600}, "expired"),
+])
+def test_invalid_claims_are_rejected(google, claims, message):
+    certs = _certificates(FakeSession(google.certificates))
+    token = google.id_token("dana@google.com", "Dana", **claims)
+
+    with pytest.raises(ValueError, match=f"(?i){message}"):
+        _verify(token, certs)
+    assert id_tokens.token_cache.stats()["size"] == 0
+
+def test_tampered_token_is_rejected_even_with_the_original_cached(google):
+    certs = _certificates(FakeSession(google.certificates))
+    token = google.id_token("dana@google.com", "Dana")
+    _verify(token, certs)
+
+    header, payload, signature = token.split(".")
+    middle = len(signature) // 2
+    flipped = "A" if signature[middle] != "A" else "B"
+    forged_signature = signature[:middle] + flipped + signature[middle + 1:]
+    forged_payload = google.id_token("mallory@google.com", "Mallory").split(".")[1]
+
+    for forged in (f"{header}.{payload}.{forged_signature}", f"{header}.{forged_payload}.{signature}"):
+        with pytest.raises(ValueError):
+            _verify(forged, certs)
+
+def test_unknown_key_id_refetches_the_certificates(google, rotated, monkeypatch):
+    monkeypatch.setattr(id_tokens, "GOOGLE_CERTS_MIN_REFRESH_SECONDS", 0)
+    session = FakeSession(google.certificates)
+    certs = _certificates(session)
+    _verify(google.id_token("dana@google.com", "Dana"), certs)
+
+    # Google rotated its keys - the old certificate is still fresh but lacks the new kid
+    session.certs = rotated.certificates
+    assert _verify(rotated.id_token("dana@google.com", "Dana"), certs)["email"] == "dana@google.com"
+    assert session.requests == 2
+    assert certs.stats()["key_ids"] == [RotatedStandIn.KEY_ID]
+
+def test_unknown_key_ids_refetch_at_most_once_per_interval(google, rotated):
+    session = FakeSession(google.certificates)
+    certs = _certificates(session)
+    certs.warm()
+
+    for _ in range(3):
+        with pytest.raises(ValueError, match="unknown key ID"):
+            _verify(rotated.id_token("dana@google.com", "Dana"), certs)
+    assert session.requests == 1
+
+def test_expired_certificates_are_used_when_the_refresh_fails(google):
+    session = FakeSession(google.certificates, max_age=0)
+    certs = _certificates(session)
+    certs.warm()
+    session.error = ConnectionError("googleapis.com unreachable")
+
+    assert _verify(google.id_token("dana@google.com", "Dana"), certs)["email"] == "dana@google.com"
+    assert certs.stats()["failures"] == 1
+
+def test_failed_first_fetch_is_an_error(google):
+    session = FakeSession(google.certificates)
+    session.error = ConnectionError("googleapis.com unreachable")
+
+    with pytest.raises(ConnectionError):
+        _verify(google.id_token("dana@google.com", "Dana"), _certificates(session))
@@ -0,0 +1,115 @@
+import threading
+
+import pytest
+
+import migrations
+from conftest import FakeConnection
+
+class FakeSchema:
+    """
+    schema_migrations and the advisory lock behind the fake pool
+    The lock is held by a thread until its connection commits or rolls back
+    """
+
+    def __init__(self):
+        self.table_exists = False
+        self.recorded = {}  # version -> checksum
+        self.executed = []  # Migration SQL, in the order it ran
+        self.lock = threading.Lock()
+        self.owner = None
+        self.before_lock = None
+
+    def handler(self, sql, args):
+        if "to_regclass" in sql:
+            return [("schema_migrations" if self.table_exists else None,)]
+        if sql.startswith("SELECT version, checksum"):
+            return [(version, checksum, None) for version, checksum in self.recorded.items()]
+        if "pg_advisory_xact_lock" in sql:
+            if self.before_lock:
+                self.before_lock()
+            if self.owner != threading.get_ident():
+                self.lock.acquire()
+                self.owner = threading.get_ident()
+            return [("",)]
+        if "CREATE TABLE IF NOT EXISTS schema_migrations" in sql:
+            self.table_exists = True
+        elif sql.startswith("SELECT 1 FROM schema_migrations"):
+            return [(1,)] if args[0] in self.recorded else []
+        elif sql.startswith("INSERT INTO schema_migrations"):
+            self.recorded[args[0]] = args[2]
+        else:
+            self.executed.append(sql)
+        return []
+
+    def end_transaction(self):
+        if self.owner == threading.get_ident():
+            self.owner = None
+            self.lock.release()
+
+@pytest.fixture
+def schema(fake_pool, monkeypatch):
+    schema = FakeSchema()
+    fake_pool.handler = schema.handler
+    for name in ("commit", "rollback"):
+        original = getattr(FakeConnection, name)
+
+        def end(self, original=original):
+            original(self)
+            schema.end_transaction()
+        monkeypatch.setattr(FakeConnection, name, end)
+    return schema
+
+def test_pending_migrations_are_applied_in_order(schema):
+    files = migrations.load_migrations()
+
+    assert migrations.migrate() == [migration.version for migration in files]
+    assert schema.executed == [migration.sql for migration in files]
+    assert schema.recorded == {migration.version: migration.checksum for migration in files}
+
+def test_only_new_migrations_run_and_reruns_do_nothing(schema):
+    files = migrations.load_migrations()
+    schema.table_exists = True
+    schema.recorded = {migration.version: migration.checksum for migration in files[:-1]}
+
+    assert migrations.migrate() == [files[-1].version]
+    assert schema.executed == [files[-1].sql]
+
+    assert migrations.migrate() == []
+    assert migrations.get_pending() == []
+    assert len(schema.executed) == 1
+
+def test_edited_migration_is_refused(schema):
+    files = migrations.load_migrations()
+    schema.table_exists = True
+    schema.recorded = {migration.version: migration.checksum for migration in files[:-1]}
+    schema.recorded[files[0].version] = "checksum of the original file"
+
+    with pytest.raises(migrations.ChecksumMismatch) as error:
+        migrations.migrate()
+    assert f"{files[0].version:04d}_{files[0].name}" in str(error.value)
+    assert schema.executed == [], "nothing may be applied on top of an edited migration"
+    assert [entry['version'] for entry in migrations.get_status() if entry['modified']] == [files[0].version]
+
+def test_concurrent_runners_apply_each_migration_once(schema):
+    files = migrations.load_migrations()
+    # Both runners read an empty schema_migrations before either takes the lock
+    started = threading.Barrier(2, timeout=5)
+    schema.before_lock = lambda: None if schema.recorded else started.wait()
+    results, errors = [], []
+
+    def runner():
+        try:
+            results.append(migrations.migrate())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=runner) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert errors == []
+    assert schema.executed == [migration.sql for migration in files]
+    applied = sorted(results[0] + results[1])
+    assert applied == [migration.version for migration in files]
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+import main
+import migrations
+
+@pytest.fixture
+def fast_start(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, "FAST_START", True)
+    monkeypatch.setattr(main, "EMAIL_DELIVERY_MODE", "direct")
+    monkeypatch.setattr(main, "GOOGLE_CLIENT_ID", None)
+    monkeypatch.setattr(migrations, "MIGRATIONS_ON_STARTUP", "apply")
+    monkeypatch.setattr(migrations, "migrate", lambda: calls.append("migrate") or [])
+    return calls
+
+def test_fast_start_migrates_before_serving(fast_start, monkeypatch):
+    def warm_pool():
+        fast_start.append("warm_pool")
+        return False  # Warm-up failures only cost latency
+
+    monkeypatch.setattr(main, "warm_pool", warm_pool)
+
+    async def scenario():
+        await main.startup()
+        # startup() returning is what lets uvicorn accept connections
+        assert fast_start == ["migrate"]
+        await asyncio.gather(*main._background_tasks)
+
+    asyncio.run(scenario())
+    assert fast_start == ["migrate", "warm_pool"]
+
+def test_failed_migration_stops_the_startup(fast_start, monkeypatch):
+    def migrate():
+        raise migrations.ChecksumMismatch("0001_base_schema")
+
+    monkeypatch.setattr(migrations, "migrate", migrate)
+    monkeypatch.setattr(main, "warm_pool", lambda: fast_start.append("warm_pool"))
+
+    with pytest.raises(migrations.ChecksumMismatch):
+        asyncio.run(main.startup())
+    assert "warm_pool" not in fast_start
+    assert not main._background_tasks
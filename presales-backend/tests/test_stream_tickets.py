@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+import main
+
+USER = {'id': '7', 'email': 'dana@google.com', 'name': 'Dana', 'role': 'presales_viewer',
+        'invite_status': 'approved'}
+
+@pytest.fixture
+def tickets(fake_pool, monkeypatch):
+    """stream_tickets as {ticket_hash: [email, expired]} behind the fake pool"""
+    rows = {}
+
+    def handler(sql, args):
+        if "INSERT INTO stream_tickets" in sql:
+            rows[args[0]] = [args[1], False]
+        elif "DELETE FROM stream_tickets" in sql and args:
+            row = rows.pop(args[0], None)
+            return [(row[0], not row[1])] if row else []
+        return []
+
+    fake_pool.handler = handler
+    monkeypatch.setattr(auth, "get_cached_user_by_email", lambda email: dict(USER, email=email))
+    return rows
+
+def _stream_user(ticket):
+    return asyncio.run(main.get_stream_user(credentials=None, ticket=ticket))
+
+def test_ticket_opens_the_stream_once(tickets):
+    ticket = auth.issue_stream_ticket("dana@google.com")
+
+    assert ticket not in tickets, "only the hash of a ticket is stored"
+    assert _stream_user(ticket)['email'] == "dana@google.com"
+    with pytest.raises(HTTPException) as error:
+        _stream_user(ticket)
+    assert error.value.status_code == 401
+
+def test_expired_ticket_is_rejected(tickets):
+    ticket = auth.issue_stream_ticket("dana@google.com")
+    for row in tickets.values():
+        row[1] = True
+
+    with pytest.raises(HTTPException) as error:
+        _stream_user(ticket)
+    assert error.value.status_code == 401
+    assert not tickets, "an expired ticket is still consumed"
+
+@pytest.mark.parametrize("ticket", [None, "", "not-a-ticket"])
+def test_stream_requires_a_valid_ticket_or_header(tickets, ticket):
+    with pytest.raises(HTTPException) as error:
+        _stream_user(ticket)
+    assert error.value.status_code == 401
@@ -0,0 +1,106 @@
+"""
+Blocking I/O executors
+Runs the synchronous pg8000 (crud/auth), SMTP (email_service) and Google
+certificate (id_tokens) work off the asyncio event loop so one slow round
+trip does not stall the whole worker.
+
+BLOCKING_IO_MODE selects how blocking calls are run:
+    threadpool - dedicated bounded thread pools for DB and email work (default)
+    inline     - call directly on the event loop (previous behaviour, for comparison)
+"""
+
+import os
+import asyncio
+import logging
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BLOCKING_IO_MODE = os.getenv("BLOCKING_IO_MODE", "threadpool").lower()
+# Default the DB pool of threads to the connection pool size - extra threads would only wait on checkout
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", os.getenv("DB_POOL_MAX_SIZE", "10")))
+EMAIL_EXECUTOR_WORKERS = int(os.getenv("EMAIL_EXECUTOR_WORKERS", "2"))
+
+if BLOCKING_IO_MODE not in ("threadpool", "inline"):
+    logger.warning(f"Unknown BLOCKING_IO_MODE '{BLOCKING_IO_MODE}', falling back to threadpool")
+    BLOCKING_IO_MODE = "threadpool"
+
+_db_executor = None
+_email_executor = None
+
+def get_db_executor():
+    """Get or create the bounded executor for database work"""
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+    return _db_executor
+
+def get_email_executor():
+    """Get or create the bounded executor for SMTP work"""
+    global _email_executor
+    if _email_executor is None:
+        _email_executor = ThreadPoolExecutor(max_workers=EMAIL_EXECUTOR_WORKERS, thread_name_prefix="email")
+    return _email_executor
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database call without blocking the event loop"""
+    if BLOCKING_IO_MODE == "inline":
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    # Carry the request's context into the thread so its DB time is attributed to it (metrics.py)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+async def run_blocking(func, *args, **kwargs):
+    """Run other blocking work (HTTP calls to third parties) on the event loop's default executor"""
+    if BLOCKING_IO_MODE == "inline":
+        return func(*args, **kwargs)
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+def submit_db(func, *args, **kwargs):
+    """
+    Queue a blocking database call on the DB executor without waiting for it
+    (cleanup that must not be awaited, e.g. from a cancelled response).
+    In inline mode the call runs synchronously.
+    """
+    if BLOCKING_IO_MODE == "inline":
+        return func(*args, **kwargs)
+    future = get_db_executor().submit(contextvars.copy_context().run, func, *args, **kwargs)
+    future.add_done_callback(_log_db_failure)
+    return future
+
+def _log_db_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error(f"Background database task failed: {exc}")
+
+def submit_email(func, *args, **kwargs):
+    """
+    Hand a blocking SMTP call to the email executor and return immediately.
+    In inline mode the call runs synchronously and its result is returned.
+    """
+    if BLOCKING_IO_MODE == "inline":
+        return func(*args, **kwargs)
+    future = get_email_executor().submit(func, *args, **kwargs)
+    future.add_done_callback(_log_email_failure)
+    return future
+
+def _log_email_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error(f"Background email task failed: {exc}")
+
+def shutdown_executors(wait=True):
+    """Stop the executors, letting queued email finish when wait is True"""
+    global _db_executor, _email_executor
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=wait)
+        _db_executor = None
+    if _email_executor is not None:
+        _email_executor.shutdown(wait=wait)
+        _email_executor = None
@@ -7,7 +7,7 @@ import MainLayout from './components/Layout/MainLayout';
 import OpportunitiesTable from './components/Opportunities/OpportunitiesTable';
 import AnalyticsDashboard from './components/Analytics/AnalyticsDashboard';
 import PeopleManagement from './components/People/PeopleManagement';
-import { opportunityService, authService } from './services/api';
+import { opportunityService, authService, changeFeed, applyOpportunityChange } from './services/api';
 import { GOOGLE_CLIENT_ID } from './utils/constants';
 
 const IDLE_TIMEOUT = 10 * 60 * 1000; // 10 minutes in milliseconds
@@ -171,6 +171,18 @@ function App() {
     }
   }, [user, loadOpportunities]);
 
+  // Apply changes pushed by the server (from any tab or user) instead of refetching
+  useEffect(() => {
+    if (!user) return undefined;
+    return changeFeed.subscribe((change) => {
+      if (change.op === 'reset') {
+        loadOpportunities();
+        return;
+      }
+      setOpportunities((current) => applyOpportunityChange(current, change));
+    });
+  }, [user, loadOpportunities]);
+
   const handleLogin = (userData) => {
     console.log('🔐 Login handler received:', userData);
     
@@ -224,8 +236,9 @@ function App() {
     }
 
     try {
-      await opportunityService.create(data);
-      await loadOpportunities();
+      const response = await opportunityService.create(data);
+      const created = response.data.data;
+      setOpportunities((current) => applyOpportunityChange(current, { id: created.id, op: 'insert', data: created }));
       showSnackbar('Opportunity created successfully');
     } catch (error) {
       showSnackbar(error.message || 'Failed to create opportunity', 'error');
@@ -244,8 +257,8 @@ function App() {
     }
 
     try {
-      await opportunityService.update(id, data);
-      await loadOpportunities();
+      const response = await opportunityService.update(id, data);
+      setOpportunities((current) => applyOpportunityChange(current, { id, op: 'update', data: response.data.data }));
       showSnackbar('Opportunity updated successfully');
     } catch (error) {
       showSnackbar(error.message || 'Failed to update opportunity', 'error');
@@ -260,7 +273,7 @@ function App() {
 
     try {
       await opportunityService.delete(id);
-      await loadOpportunities();
+      setOpportunities((current) => applyOpportunityChange(current, { id, op: 'delete' }));
       showSnackbar('Opportunity deleted successfully');
     } catch (error) {
       showSnackbar(error.message || 'Failed to delete opportunity', 'error');
@@ -394,7 +407,7 @@ function App() {
 
           // Tab 1: Analytics
           if (currentTab === 1) {
-            return <AnalyticsDashboard opportunities={opportunities} />;
+            return <AnalyticsDashboard />;
           }
 
           // Tab 2: People Management (only for admins)
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { Box, Grid, Paper, Typography, TextField, MenuItem, Button } from '@mui/material';
 import {
   AreaChart,
@@ -15,70 +15,74 @@ import TrendingUpIcon from '@mui/icons-material/TrendingUp';
 import AttachMoneyIcon from '@mui/icons-material/AttachMoney';
 import BusinessIcon from '@mui/icons-material/Business';
 import AssessmentIcon from '@mui/icons-material/Assessment';
+import { analyticsService, opportunityService, changeFeed } from '../../services/api';
 
-const AnalyticsDashboard = ({ opportunities }) => {
+const EMPTY_SUMMARY = {
+  totals: { count: 0, total_deal_value: 0, avg_deal_value: 0, active_count: 0 },
+  monthly: [],
+  by_region: [],
+  by_status: [],
+};
+
+const AnalyticsDashboard = () => {
   const [statusFilter, setStatusFilter] = useState('');
   const [regionFilter, setRegionFilter] = useState('');
+  const [summary, setSummary] = useState(EMPTY_SUMMARY);
+  const [facets, setFacets] = useState({ status: [], region: [] });
+  const [refreshKey, setRefreshKey] = useState(0);
 
-  const allStatuses = [...new Set(opportunities.map((o) => o.status).filter(Boolean))];
-  const allRegions = [...new Set(opportunities.map((o) => o.region).filter(Boolean))];
+  // Refresh the (small) summary when opportunities change, at most once a second
+  useEffect(() => {
+    let timer = null;
+    const unsubscribe = changeFeed.subscribe(() => {
+      if (!timer) {
+        timer = setTimeout(() => {
+          timer = null;
+          setRefreshKey((key) => key + 1);
+        }, 1000);
+      }
+    });
+    return () => {
+      clearTimeout(timer);
+      unsubscribe();
+    };
+  }, []);
 
-  const filteredOpportunities = opportunities.filter((opp) => {
-    const matchesStatus = !statusFilter || opp.status === statusFilter;
-    const matchesRegion = !regionFilter || opp.region === regionFilter;
-    return matchesStatus && matchesRegion;
-  });
+  useEffect(() => {
+    opportunityService.getFacets()
+      .then((response) => setFacets(response.data.data))
+      .catch((error) => console.error('Error loading analytics filters:', error));
+  }, []);
 
-  const totalDealValue = filteredOpportunities.reduce(
-    (sum, o) => sum + (o.deal_value_usd || 0),
-    0
-  );
-  const activeOpportunities = filteredOpportunities.filter(
-    (o) => o.status === 'Active'
-  ).length;
-  const avgDealValue = filteredOpportunities.length > 0 
-    ? totalDealValue / filteredOpportunities.length 
-    : 0;
+  useEffect(() => {
+    const params = {};
+    if (statusFilter) params.status = statusFilter;
+    if (regionFilter) params.region = regionFilter;
+    analyticsService.getSummary(params)
+      .then((response) => setSummary(response.data.data))
+      .catch((error) => console.error('Error loading analytics:', error));
+  }, [statusFilter, regionFilter, refreshKey]);
 
-  // Monthly trend data
-  const monthlyData = filteredOpportunities.reduce((acc, opp) => {
-    const date = opp.presales_start_date || opp.expected_planned_start || new Date().toISOString();
-    const month = new Date(date).toLocaleDateString('en-US', { month: 'short' });
-    
-    if (!acc[month]) {
-      acc[month] = { month, count: 0, value: 0 };
-    }
-    acc[month].count += 1;
-    acc[month].value += opp.deal_value_usd || 0;
-    return acc;
-  }, {});
+  const allStatuses = facets.status;
+  const allRegions = facets.region;
 
-  const trendData = Object.values(monthlyData).slice(0, 7);
+  const totalCount = summary.totals.count;
+  const totalDealValue = summary.totals.total_deal_value;
+  const activeOpportunities = summary.totals.active_count;
+  const avgDealValue = summary.totals.avg_deal_value;
 
-  // Region data
-  const regionData = filteredOpportunities.reduce((acc, opp) => {
-    const region = opp.region || 'Unknown';
-    if (!acc[region]) {
-      acc[region] = { name: region, count: 0, value: 0 };
-    }
-    acc[region].count += 1;
-    acc[region].value += opp.deal_value_usd || 0;
-    return acc;
-  }, {});
+  // Monthly trend data - most recent months, oldest first
+  const trendData = summary.monthly.slice(-7).map((m) => ({
+    month: new Date(`${m.month}T00:00:00`).toLocaleDateString('en-US', { month: 'short' }),
+    count: m.count,
+    value: m.value,
+  }));
 
-  const regionChartData = Object.values(regionData);
+  // Region data
+  const regionChartData = summary.by_region;
 
   // Status data
-  const statusData = filteredOpportunities.reduce((acc, opp) => {
-    const status = opp.status || 'Unknown';
-    if (!acc[status]) {
-      acc[status] = { name: status, value: 0 };
-    }
-    acc[status].value += 1;
-    return acc;
-  }, {});
-
-  const statusChartData = Object.values(statusData);
+  const statusChartData = summary.by_status.map((s) => ({ name: s.name, value: s.count }));
 
   const formatCurrency = (value) => {
     if (value >= 1000000) {
@@ -223,8 +227,8 @@ const AnalyticsDashboard = ({ opportunities }) => {
     );
   };
 
-  const completionPercentage = filteredOpportunities.length > 0
-    ? Math.round((activeOpportunities / filteredOpportunities.length) * 100)
+  const completionPercentage = totalCount > 0
+    ? Math.round((activeOpportunities / totalCount) * 100)
     : 0;
 
   return (
@@ -294,7 +298,7 @@ const AnalyticsDashboard = ({ opportunities }) => {
         <Grid item xs={12} sm={6} md={3}>
           <MetricCard
             title="Total Opportunities"
-            value={filteredOpportunities.length}
+            value={totalCount}
             icon={<BusinessIcon sx={{ fontSize: 28 }} />}
             color="#4285F4"
           />
@@ -405,7 +409,7 @@ const AnalyticsDashboard = ({ opportunities }) => {
               color="#4285F4"
             />
             <Typography variant="body2" color="#64748b" mt={2} textAlign="center">
-              {activeOpportunities} out of {filteredOpportunities.length} opportunities are active
+              {activeOpportunities} out of {totalCount} opportunities are active
             </Typography>
           </Paper>
         </Grid>
@@ -123,13 +123,187 @@ export const userService = {
   delete: (userId) => api.delete(`/users/${userId}`),
 };
 
+// Opportunity list responses pre-rendered by the server (same body, much faster to produce)
+const FAST_JSON_HEADERS = { Accept: 'application/json; shape=records' };
+
 // Opportunity Services
 export const opportunityService = {
-  getAll: () => api.get('/opportunities/'),
+  getAll: () => api.get('/opportunities/', { params: { all: true }, headers: FAST_JSON_HEADERS }),
+  /**
+   * Fetch one page of opportunities
+   * @param {Object} params - limit, cursor, sort, order, include_total, and filters:
+   *   status, region, sub_region, presales_start_from/to, sow_signature_from/to,
+   *   min_deal_value, max_deal_value, q (free-text search)
+   * @returns {Promise} - Response with data, next_cursor and optional estimated_total
+   */
+  list: (params) => api.get('/opportunities/', {
+    params,
+    paramsSerializer: { indexes: null },
+    headers: FAST_JSON_HEADERS,
+  }),
+  getFacets: () => api.get('/opportunities/facets'),
+  /**
+   * Upload a CSV of opportunities (upserted on account_name + opportunity)
+   * @param {File} file - CSV file with a header row
+   * @param {boolean} dryRun - validate only, nothing is written
+   * @returns {Promise} - Import report with inserted/updated counts and rejected rows
+   */
+  importCsv: (file, dryRun = false) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return api.post('/opportunities/import', formData, {
+      params: { dry_run: dryRun },
+      headers: { 'Content-Type': 'multipart/form-data' },
+      timeout: 0,
+    });
+  },
+  /**
+   * Download opportunities as a file streamed by the server
+   * @param {string} format - csv, ndjson or xlsx
+   * @param {Object} params - same filters as list
+   */
+  export: (format = 'csv', params = {}) => api.get('/opportunities/export', {
+    params: { ...params, format },
+    paramsSerializer: { indexes: null },
+    responseType: 'blob',
+    timeout: 0,
+  }),
+  /**
+   * Delta sync - records changed since a data version plus deleted ids
+   * @param {number} since - 'version' from the previous sync
+   * @param {string} cursor - next_cursor from the previous page, if any
+   * @returns {Promise} - {data, deleted, version, next_cursor}; 410 means reload everything
+   */
+  getChanges: (since, cursor) => api.get('/opportunities/changes', { params: { since, cursor } }),
   getById: (id) => api.get(`/opportunities/${id}`),
   create: (data) => api.post('/opportunities/', data),
-  update: (id, data) => api.put(`/opportunities/${id}`, data),
+  /**
+   * Update an opportunity
+   * @param {string|number} id
+   * @param {Object} data - fields to change
+   * @param {string} etag - optional ETag from getById; the server answers 412 if the record changed since
+   */
+  update: (id, data, etag) => api.put(`/opportunities/${id}`, data, etag ? { headers: { 'If-Match': etag } } : {}),
   delete: (id) => api.delete(`/opportunities/${id}`),
+  // Bulk operations - mode is 'atomic' (all or nothing) or 'best_effort'; results are reported per row
+  bulkCreate: (items, mode = 'atomic') => api.post('/opportunities/bulk', { mode, items }),
+  bulkUpdate: (items, mode = 'atomic') => api.patch('/opportunities/bulk', { mode, items }),
+  bulkDelete: (ids, mode = 'atomic') => api.delete('/opportunities/bulk', { data: { mode, ids } }),
+};
+
+// Live change feed - one EventSource per tab shared by every subscriber.
+// EventSource cannot send headers and the JWT must not go in a URL, so each
+// connection is opened with a single-use ticket. A ticket cannot be replayed by
+// EventSource's own reconnect, so on error the source is reopened with a fresh
+// ticket and resumes after the last event id it saw.
+const CHANGE_FEED_RETRY_MS = 3000;
+const changeListeners = new Set();
+let changeSource = null;
+let changeRetryTimer = null;
+let lastChangeEventId = null;
+
+const closeChangeSource = () => {
+  clearTimeout(changeRetryTimer);
+  changeRetryTimer = null;
+  if (changeSource) {
+    changeSource.close();
+    changeSource = null;
+  }
+};
+
+const scheduleChangeSource = () => {
+  closeChangeSource();
+  if (changeListeners.size > 0) {
+    changeRetryTimer = setTimeout(openChangeSource, CHANGE_FEED_RETRY_MS);
+  }
+};
+
+const openChangeSource = async () => {
+  let ticket;
+  try {
+    ({ data: { ticket } } = await api.post('/opportunities/stream/ticket'));
+  } catch (error) {
+    scheduleChangeSource();
+    return;
+  }
+  // Everyone unsubscribed (or another open won) while the ticket was requested
+  if (changeListeners.size === 0 || changeSource) {
+    return;
+  }
+  const params = new URLSearchParams({ ticket });
+  if (lastChangeEventId) {
+    params.set('since', lastChangeEventId);
+  }
+  const source = new EventSource(`${API_BASE_URL}/opportunities/stream?${params}`);
+  const remember = (event) => {
+    if (event.lastEventId) {
+      lastChangeEventId = event.lastEventId;
+    }
+  };
+  source.addEventListener('ready', remember);
+  source.addEventListener('change', (event) => {
+    remember(event);
+    const change = JSON.parse(event.data);
+    changeListeners.forEach((notify) => notify(change));
+  });
+  // Sent when the server can no longer replay what this tab missed
+  source.addEventListener('reset', (event) => {
+    remember(event);
+    changeListeners.forEach((notify) => notify({ op: 'reset' }));
+  });
+  source.onerror = scheduleChangeSource;
+  changeSource = source;
+};
+
+export const changeFeed = {
+  /**
+   * Listen for opportunity changes pushed by the server
+   * @param {Function} listener - called with {version, id, op, data} for every change,
+   *   or {op: 'reset'} when the caller should reload everything
+   * @returns {Function} - unsubscribe
+   */
+  subscribe: (listener) => {
+    changeListeners.add(listener);
+    if (changeListeners.size === 1 && typeof EventSource !== 'undefined') {
+      openChangeSource();
+    }
+    return () => {
+      changeListeners.delete(listener);
+      if (changeListeners.size === 0) {
+        closeChangeSource();
+        lastChangeEventId = null;
+      }
+    };
+  },
+};
+
+/**
+ * Apply one change event (or a write response) to a list of opportunities
+ * @param {Array} records - current list
+ * @param {Object} change - {id, op, data}
+ * @returns {Array} - new list
+ */
+export const applyOpportunityChange = (records, change) => {
+  if (change.op === 'delete' || !change.data) {
+    return records.filter((record) => record.id !== change.id);
+  }
+  const index = records.findIndex((record) => record.id === change.id);
+  if (index === -1) {
+    return [...records, change.data];
+  }
+  const next = [...records];
+  next[index] = change.data;
+  return next;
+};
+
+// Analytics Services
+export const analyticsService = {
+  /**
+   * Aggregated dashboard data computed by the server
+   * @param {Object} params - same filters as opportunityService.list
+   * @returns {Promise} - Response with totals, monthly, by_region and by_status
+   */
+  getSummary: (params) => api.get('/analytics/summary', { params, paramsSerializer: { indexes: null } }),
 };
 
 export default api;
\ No newline at end of file